@@ -1,457 +1,1006 @@
-#!/usr/bin/env python3
-
-import sys
-import json
-import xml.etree.ElementTree as ET
-import os
-import subprocess
-from collections import namedtuple
-import re
-
-baseXML = """<?xml version="1.0" encoding="UTF-8"?>
-<module fritzingVersion="0.9.3b.04.19.5c895d327c44a3114e5fcc9d8260daf0cbb52806">
-    <views>
-        <view name="breadboardView" backgroundColor="#ffffff" gridSize="0.1in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
-        <view name="schematicView" backgroundColor="#ffffff" gridSize="0.1in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
-        <view name="pcbView" backgroundColor="#333333" gridSize="0.05in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
-    </views>
-    <instances>
-    </instances>
-</module>"""
-
-# pin1J
-# x2="-243.379" y2="178.619"
-
-# pin3Z
-# x2="-225.362" y2="142.619"
-
-# pin3J
-# x2="-225.379" y2="178.619"
-
-# pin61Z
-# x2="296.635" y2="142.619"
-
-# pin63F
-# x2="314.617" y2="214.619"
-
-# pin63A
-# x2="314.617" y2="277.619"
-
-# pin1E
-# x2="-243.379" y2="241.619"
-
-# pin3X
-# x2="-225.362" y2="304.619"
-
-# pin61W
-# x2="126.379" y2="-204.737"
-
-
-Point = namedtuple("Point", "x y")
-DoublePoint = namedtuple("DoublePoint", "x y x2 y2")
-
-def getWireCoordinate(pinValue0, pinValue1):
-    pin = getCoordinate(pinValue0)
-    pin2 = getCoordinate(pinValue1)
-
-    x = pin.x + 19
-    y = pin.y + 4
-    x2 = pin2.x - pin.x
-    y2 = pin2.y - pin.y
-
-    wire_points = DoublePoint(x, y, x2, y2)
-    return wire_points
-
-
-
-def getCoordinate(pinValue):
-    number = int(re.findall(r"\d+", pinValue)[0])
-    letter = pinValue[-1] 
-
-    # 9 is the increment for pins
-    x_coord = -243.379 + 200 + 9*(number-1)
-    y_coord = 0.0
-
-    # If Y,Z (top)
-    # pin3Z y="142.619"
-    if letter in "YZ":
-        y_coord = 142.619 - 100 + 9 * (ord('Z') - ord(letter))
-    
-    # If F,G,H,I,J
-    # pin 1J y="178.619"
-    # J = 74, F = 70
-    if letter in "FGHIJ":
-        y_coord = 178.619 - 100 + 9 * (ord('J') - ord(letter))
-
-    # If A,B,C,D,E
-    # pin1E y="241.619"
-    if letter in "ABCDE":
-        y_coord = 241.619 - 100 + 9 * (ord('E') - ord(letter))
-
-    # If W, X (bottom)
-    # pin3X y="304.619"
-    if letter in "WX":
-        y_coord = 304.619 - 100 + 9 * (ord('X') - ord(letter))
-
-
-    pin_point = Point(x_coord, y_coord)
-    return pin_point
-
-# connector0 is always the default "starting" position of the resistor
-def getResistorPinOffset(modulename, connector, pinValueTarget):
-
-    module = root.find("./instances/instance/[title='" + modulename + "']")
-    geometry = module.find("./views/breadboardView/geometry")
-
-    x = geometry.get("x")
-    y = geometry.get("y")
-
-    # pinStart will be at x="-1.3095" y="0" in reference to the resistor's "origin"
-    pinStart = Point(x,y)
-    pinTarget = getCoordinate(pinValueTarget)
-
-    xDiff = float(pinTarget.x) - float(pinStart.x)
-    yDiff = float(pinTarget.y) - float(pinStart.y)
-
-    if connector == "connector0":
-        x_coord = -1.3095 + xDiff + 18
-    else:
-        x_coord = 1.3095 + xDiff - 18
-    y_coord = 0 + yDiff
-
-    pin_point = Point(x_coord, y_coord)
-    return pin_point
-
-XIncrement = 70.0
-YIncrement = 70.0
-
-"""
-if len(sys.argv) != 2:
-    print("Requires a single command line argument: the name of the json text file to import")
-    exit()
-
-filename = sys.argv[1];
-with open(filename) as jsonFile:
-    jsonData = json.load(jsonFile)
-
-components = jsonData["components"]
-connections = jsonData["connections"]
-"""
-#power0VConnector = "connector0"
-#powerPositiveConnector = "connector1"
-#powerNegativeConnector = "connector2"
-
-tree = ET.parse('blank.fz')
-root = tree.getroot()
-
-portLocations = {}
-
-globalIndex = 1
-moduleX = 1.0
-moduleY = 1.0
-
-def addInstance(moduleIdRef, title, geometry, properties):
-    global root
-    global globalIndex
-
-    instances = root.find("instances")
-    retval = str(globalIndex)
-
-    #create new instance and increment index
-    newinstance = ET.SubElement(instances, "instance", {"moduleIdRef" : moduleIdRef, "modelIndex" : str(globalIndex)})
-    globalIndex += 1
-
-    #add properties, if any
-    for key, value in properties.iteritems():
-        ET.SubElement(newinstance, "property", {"name" : key, "value" : value})
-
-    #add modulename as title
-    newtitle = ET.SubElement(newinstance, "title")
-    newtitle.text = title
-
-    #add views
-    newviews = ET.SubElement(newinstance, "views")
-    newschematicview = ET.SubElement(newviews, "schematicView", {"layer" : "schematic"})
-    newbreadboardview = ET.SubElement(newviews, "breadboardView", {"layer" : "breadboard"})
-    newpcbview = ET.SubElement(newviews, "pcbView", {"layer" : "copper0"})
-
-    #add geometries and increment location
-    newschematicgeometry = ET.SubElement(newschematicview, "geometry", geometry)
-    newbreadboardgeometry = ET.SubElement(newbreadboardview, "geometry", geometry)    
-    newpcbgeometry = ET.SubElement(newpcbview, "geometry", geometry)
-    return retval
-
-def addResistor(title, pin1, pin2, resistance):
-    # place resistor in midpoint between pins
-    pin1_coord = getCoordinate(pin1)
-    pin2_coord = getCoordinate(pin2)
-    x = (pin1_coord.x + pin2_coord.x)/2
-    y = (pin1_coord.y + pin2_coord.y)/2
-    addInstance("ResistorModuleID", title, {"x" : str(x), "y" : str(y), "z" : "2.5"}, {"resistance" : str(resistance)})
-    addBreadboardConn(title, pin1, pin2)
-    insertResistorPins(title, pin1, pin2)
-
-
-# not supported rn
-def addCapacitor(title, x, y, capacitance):
-    addInstance("100milCeramicCapacitorModuleID", title, {"x" : str(x), "y" : str(y), "z" : "2.5"}, {"capacitance" : str(capacitance)})
-
-
-# modulename1 = resistor
-# connectorID1 = resistor pin (ex: connector0, connector1)
-# modulename2 = breadboard
-# connectorID2 = breadboard pin (ex: pin34J)
-# NEED TO ALWAYS assign connector0 of resistor before connector1 OR IT WON'T WORK
-# visually, connector0 is the right side and connector1 is the left side of a resistor place on the breadboard
-
-def addtoBreadboard(modulename1, connectorID1, modulename2, connectorID2):
-
-    m1 = root.find("./instances/instance/[title='" + modulename1 + "']")
-    m2 = root.find("./instances/instance/[title='" + modulename2 + "']")
-
-    modelIndex1 = m1.get("modelIndex")
-    modelIndex2 = m2.get("modelIndex")
-
-    try:
-        #specify connections between wire instance and both end connectors
-        conns1_s = m1.find("./views/schematicView/connectors")
-        if conns1_s is None:
-            conns1_s = ET.SubElement(m1.find("./views/schematicView"), "connectors")
-        conns1_b = m1.find("./views/breadboardView/connectors")
-        if conns1_b is None:
-            conns1_b = ET.SubElement(m1.find("./views/breadboardView"), "connectors")
-        conns1_p = m1.find("./views/pcbView/connectors")
-        if conns1_p is None:
-            conns1_p = ET.SubElement(m1.find("./views/pcbView"), "connectors")
-
-        c1_s = conns1_s.find("./connector[@connectorId='" + connectorID1 + "']")
-        if c1_s is None:
-            c1_s = ET.SubElement(conns1_s, "connector", {"connectorId" : connectorID1, "layer" : "schematic"})
-        c1_b = conns1_b.find("./connector[@connectorId='" + connectorID1 + "']")
-        if c1_b is None:
-            c1_b = ET.SubElement(conns1_b, "connector", {"connectorId" : connectorID1, "layer" : "breadboard"})
-        c1_p = conns1_p.find("./connector[@connectorId='" + connectorID1 + "']")
-        if c1_p is None:
-            c1_p = ET.SubElement(conns1_p, "connector", {"connectorId" : connectorID1, "layer" : "copper0"})
-        
-        connects1_s = c1_s.find("./connects")
-        if connects1_s is None:
-            connects1_s = ET.SubElement(c1_s, "connects")
-        ET.SubElement(connects1_s, "connect", {"connectorId" : connectorID2, "modelIndex" : modelIndex2, "layer" : "schematicTrace"})
-        connects1_b = c1_b.find("./connects")
-        if connects1_b is None:
-            connects1_b = ET.SubElement(c1_b, "connects")
-        ET.SubElement(connects1_b, "connect", {"connectorId" : connectorID2, "modelIndex" : modelIndex2, "layer" : "breadboardWire"})
-        connects1_p = c1_p.find("./connects")
-        if connects1_p is None:
-            connects1_p = ET.SubElement(c1_p, "connects")
-        ET.SubElement(connects1_p, "connect", {"connectorId" : connectorID2, "modelIndex" : modelIndex2, "layer" : "copper0trace"})
-
-        conns2_s = m2.find("./views/schematicView/connectors")
-        if conns2_s is None:
-            conns2_s = ET.SubElement(m2.find("./views/schematicView"), "connectors")
-        conns2_b = m2.find("./views/breadboardView/connectors")
-        if conns2_b is None:
-            conns2_b = ET.SubElement(m2.find("./views/breadboardView"), "connectors")
-        conns2_p = m2.find("./views/pcbView/connectors")
-        if conns2_p is None:
-            conns2_p = ET.SubElement(m2.find("./views/pcbView"), "connectors")
-
-        c2_s = conns2_s.find("./connector[@connectorId='" + connectorID2 + "']")
-        if c2_s is None:
-            c2_s = ET.SubElement(conns2_s, "connector", {"connectorId" : connectorID2, "layer" : "schematic"})
-        c2_b = conns2_b.find("./connector[@connectorId='" + connectorID2 + "']")
-        if c2_b is None:
-            c2_b = ET.SubElement(conns2_b, "connector", {"connectorId" : connectorID2, "layer" : "breadboard"})
-        c2_p = conns2_p.find("./connector[@connectorId='" + connectorID2 + "']")
-        if c2_p is None:
-            c2_p = ET.SubElement(conns2_p, "connector", {"connectorId" : connectorID2, "layer" : "copper0"})
-
-        connects2_s = c2_s.find("./connects")
-        if connects2_s is None:
-            connects2_s = ET.SubElement(c2_s, "connects")
-        ET.SubElement(connects2_s, "connect", {"connectorId" : connectorID1, "modelIndex" : modelIndex1, "layer" : "schematicTrace"})
-        connects2_b = c2_b.find("./connects")
-        if connects2_b is None:
-            connects2_b = ET.SubElement(c2_b, "connects")
-        ET.SubElement(connects2_b, "connect", {"connectorId" : connectorID1, "modelIndex" : modelIndex1, "layer" : "breadboardWire"})
-        connects2_p = c2_p.find("./connects")
-        if connects2_p is None:
-            connects2_p = ET.SubElement(c2_p, "connects")
-        ET.SubElement(connects2_p, "connect", {"connectorId" : connectorID1, "modelIndex" : modelIndex1, "layer" : "copper0trace"})
-
-
-    except NameError:
-        print("Could not find matching instances for connection")
-
-# resistor title, connector0, connector1
-def insertResistorPins(modulename, pinValue0, pinValue1):
-    module = root.find("./instances/instance/[title='" + modulename + "']")
-    conns_b = module.find("./views/breadboardView/connectors")
-
-
-    for connector in ["connector0", "connector1"]:
-        c_b = conns_b.find("./connector[@connectorId='" + connector + "']")
-        connectPin = c_b.find("./connects/connect[@modelIndex='1']")
-
-        # for end of the pin -> need to go to 
-        # breadboardview / connectors / connector / leg / the 2nd point in the leg changes where the resistor pin connects to
-        c_leg = ET.SubElement(c_b, "leg")
-        childPoint = ET.Element("point", {"x": "0", "y": "0"})
-        childBezier = ET.Element("bezier")
-        c_leg.append(childPoint)
-        c_leg.append(childBezier)
-
-        if connector == "connector0":
-            offset_coord = getResistorPinOffset(modulename, connector, pinValue0)
-        else:
-            offset_coord = getResistorPinOffset(modulename, connector, pinValue1)
-        childPoint = ET.Element("point", {"x": str(offset_coord.x), "y": str(offset_coord.y)})
-        childBezier = ET.Element("bezier")
-        c_leg.append(childPoint)
-        c_leg.append(childBezier)
-
-# hardcoded coordinate for power
-def insertPowerPins(modulename):
-    module = root.find("./instances/instance/[title='" + modulename + "']")
-    conns_b = module.find("./views/breadboardView/connectors")
-
-
-    for connector in ["connector0", "connector1"]:
-        c_b = conns_b.find("./connector[@connectorId='" + connector + "']")
-        connectPin = c_b.find("./connects/connect[@modelIndex='1']")
-
-        # for end of the pin -> need to go to 
-        # breadboardview / connectors / connector / leg / the 2nd point in the leg changes where the resistor pin connects to
-        c_leg = ET.SubElement(c_b, "leg")
-        childPoint = ET.Element("point", {"x": "0", "y": "0"})
-        childBezier = ET.Element("bezier")
-        c_leg.append(childPoint)
-        c_leg.append(childBezier)
-
-        if connector == "connector0":
-            offset_coord = Point(44, -16-9*8)
-        else:
-            offset_coord = Point(35, 10+9*10)
-
-        childPoint = ET.Element("point", {"x": str(offset_coord.x), "y": str(offset_coord.y)})
-        childBezier = ET.Element("bezier")
-        c_leg.append(childPoint)
-        c_leg.append(childBezier)
-
-
-# for simplicity, assume every connection adds a single wire between connectors
-def addWire(modulename1, connectorID1, connectorID2):
-
-    m1 = root.find("./instances/instance/[title='" + modulename1 + "']")
-
-    # instances = root.find("instances")
-    # for m in instances.findall("instance"):
-    #     if m.get("title") == modulename1:
-    #         print("found")
-    #         m1 = m
-    #         break
-    #
-    # for m in instances.findall("instance"):
-    #     if m.get("title") == modulename2:
-    #         m2 = m
-    #         break
-
-    try:
-        # add a wire instance
-
-        wirePoints = getWireCoordinate(connectorID1, connectorID2)
-
-        x = str(wirePoints.x)
-        y = str(wirePoints.y)
-        x2 = str(wirePoints.x2)
-        y2 = str(wirePoints.y2)
-
-        wire_title = "Wire" + str(globalIndex)
-
-        wireId = addInstance("WireModuleID", wire_title,
-            {"x" : x, "y" : y, "x1" : "0", "y1" : "0", "x2" : x2, "y2" : y2}, {})
-
-        newWire = root.find("./instances/instance/[title='Wire" + wireId + "']")
-
-        # for the newly created wire
-        conns3_s = newWire.find("./views/schematicView/connectors")
-        if conns3_s is None:
-            conns3_s = ET.SubElement(newWire.find("./views/schematicView"), "connectors")
-        conns3_b = newWire.find("./views/breadboardView/connectors")
-        if conns3_b is None:
-            conns3_b = ET.SubElement(newWire.find("./views/breadboardView"), "connectors")
-        conns3_p = newWire.find("./views/pcbView/connectors")
-        if conns3_p is None:
-            conns3_p = ET.SubElement(newWire.find("./views/pcbView"), "connectors")
-
-        c3_s = ET.SubElement(conns3_s, "connector", {"connectorId" : "connector0", "layer" : "schematicTrace"})
-        c4_s = ET.SubElement(conns3_s, "connector", {"connectorId" : "connector1", "layer" : "schematicTrace"})
-        c3_b = ET.SubElement(conns3_b, "connector", {"connectorId" : "connector0", "layer" : "breadboardWire"})
-        c4_b = ET.SubElement(conns3_b, "connector", {"connectorId" : "connector1", "layer" : "breadboardWire"})
-        c3_p = ET.SubElement(conns3_p, "connector", {"connectorId" : "connector0", "layer" : "copper0trace"})
-        c4_p = ET.SubElement(conns3_p, "connector", {"connectorId" : "connector1", "layer" : "copper0trace"})
-
-        connects3_s = ET.SubElement(c3_s, "connects")
-        connects4_s = ET.SubElement(c4_s, "connects")
-        connects3_b = ET.SubElement(c3_b, "connects")
-        connects4_b = ET.SubElement(c4_b, "connects")
-        connects3_p = ET.SubElement(c3_p, "connects")
-        connects4_p = ET.SubElement(c4_p, "connects")
-
-        ET.SubElement(connects3_s, "connect", {"connectorId" : connectorID1, "modelIndex" : m1.get("modelIndex"), "layer" : "schematic"})
-        ET.SubElement(connects4_s, "connect", {"connectorId" : connectorID2, "modelIndex" : m1.get("modelIndex"), "layer" : "schematic"})
-        ET.SubElement(connects3_b, "connect", {"connectorId" : connectorID1, "modelIndex" : m1.get("modelIndex"), "layer" : "breadboard"})
-        ET.SubElement(connects4_b, "connect", {"connectorId" : connectorID2, "modelIndex" : m1.get("modelIndex"), "layer" : "breadboard"})
-        ET.SubElement(connects3_p, "connect", {"connectorId" : connectorID1, "modelIndex" : m1.get("modelIndex"), "layer" : "copper0"})
-        ET.SubElement(connects4_p, "connect", {"connectorId" : connectorID2, "modelIndex" : m1.get("modelIndex"), "layer" : "x"})
-
-    except NameError:
-        print("Could not find matching instances for connection")
-    
-    return wire_title
-
-# breadboard (DON'T CHANGE THE COORDINATEs)
-z="1.5"
-x="-38"
-y="38"
-addInstance("Breadboard-RSR03MB102-ModuleID", "breadboard_hi", {"z" : z, "x" : x, "y" : y}, {})
-
-
-
-
-def addBreadboardConn(modulename, pinValue0, pinValue1):
-    addtoBreadboard(modulename, "connector0", "breadboard_hi", pinValue0)
-    addtoBreadboard(modulename, "connector1", "breadboard_hi", pinValue1)
-
-# for power
-addInstance("1000AFDF10011leg", "power", {"z" : z, "x" : "-250", "y" : "75"}, {})
-addBreadboardConn("power", "pin4Z", "pin3W")
-insertPowerPins("power")
-wire_title = addWire("breadboard_hi", "pin3X", "pin3Z")
-wire_title = addWire("breadboard_hi", "pin4W", "pin4Y")
-
-# wheatstone bridge example
-addResistor("resistor_1", "pin8E", "pin12E", 200)
-addResistor("resistor_2", "pin8A", "pin13A", 200)
-addResistor("resistor_3", "pin12B", "pin13A", 200)
-addResistor("resistor_4", "pin12C", "pin18B", 200)
-addResistor("resistor_5", "pin13E", "pin18E", 200)
-
-wire_title = addWire("breadboard_hi", "pin6W", "pin8C")
-wire_title = addWire("breadboard_hi", "pin18A", "pin18X")
-
-# wire_title = addWire("breadboard_hi", "pin18E", "pin62B")
-# addResistor("resistor_6", "pin8E", "pin20G", 200)
-# addResistor("resistor_7", "pin20G", "pin52F", 200)
-
-
-
-
-tree.write("testout1.fz")
-
-# automatically open the file in fritzing
-try:
-    subprocess.call(['open', "testout1.fz"])
-except Exception, e:
-    print str(e)
+#!/usr/bin/env python3
+
+import sys
+import io
+import itertools
+import json
+import argparse
+import multiprocessing
+import xml.etree.ElementTree as ET
+import os
+import zipfile
+
+import numpy as np
+from collections import namedtuple
+
+baseXML = """<?xml version="1.0" encoding="UTF-8"?>
+<module fritzingVersion="0.9.3b.04.19.5c895d327c44a3114e5fcc9d8260daf0cbb52806">
+    <views>
+        <view name="breadboardView" backgroundColor="#ffffff" gridSize="0.1in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
+        <view name="schematicView" backgroundColor="#ffffff" gridSize="0.1in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
+        <view name="pcbView" backgroundColor="#333333" gridSize="0.05in" showGrid="1" alignToGrid="1" viewFromBelow="0"/>
+    </views>
+    <instances>
+    </instances>
+</module>"""
+
+# pin1J
+# x2="-243.379" y2="178.619"
+
+# pin3Z
+# x2="-225.362" y2="142.619"
+
+# pin3J
+# x2="-225.379" y2="178.619"
+
+# pin61Z
+# x2="296.635" y2="142.619"
+
+# pin63F
+# x2="314.617" y2="214.619"
+
+# pin63A
+# x2="314.617" y2="277.619"
+
+# pin1E
+# x2="-243.379" y2="241.619"
+
+# pin3X
+# x2="-225.362" y2="304.619"
+
+# pin61W
+# x2="126.379" y2="-204.737"
+
+
+Point = namedtuple("Point", "x y")
+DoublePoint = namedtuple("DoublePoint", "x y x2 y2")
+
+class BreadboardGeometry(object):
+    """Where every hole of a breadboard is, precomputed from its layout.
+
+    columns strips are numbered from 1, each with the rows of rowGroups; the
+    rails (any row not in "ABCDEFGHIJ") only have holes in railColumns. Rows in
+    a group are pitch apart, from the group's first row at y. Pins are named
+    like Fritzing's, "pin" + column + row, e.g. pin12E or pin3W.
+    """
+
+    STRIP_ROWS = "ABCDEFGHIJ"
+
+    def __init__(self, moduleIdRef, columns, railColumns, x=-243.379 + 200, rowGroups=None, pitch=9):
+        self.moduleIdRef = moduleIdRef
+        self.columns = columns
+        if rowGroups is None:
+            # top rails, the two halves of the strips, bottom rails
+            rowGroups = (("ZY", 142.619 - 100), ("JIHGF", 178.619 - 100), ("EDCBA", 241.619 - 100), ("XW", 304.619 - 100))
+        rowY = {}
+        for rows, y in rowGroups:
+            for i, row in enumerate(rows):
+                rowY[row] = y + pitch * i
+        railColumns = sorted(railColumns)
+
+        names, numbers, rows = [], [], []
+        for row in sorted(rowY):
+            for number in (range(1, columns + 1) if row in self.STRIP_ROWS else railColumns):
+                names.append("pin%d%s" % (number, row))
+                numbers.append(number)
+                rows.append(row)
+        self.names = names
+        self.index = dict((name, i) for i, name in enumerate(names))
+        self.numbers = np.array(numbers)
+        self.rows = np.array(rows)
+        self.xs = x + pitch * (self.numbers - 1)
+        self.ys = np.array([rowY[row] for row in rows])
+        # holes joined inside the board: the A-E and F-J halves of each column, and each rail
+        stripIds = {}
+        strips = []
+        for number, row in zip(numbers, rows):
+            if row in self.STRIP_ROWS:
+                key = (number, row in "ABCDE")
+            else:
+                key = row
+            strips.append(stripIds.setdefault(key, len(stripIds)))
+        self.strips = np.array(strips)
+        self.stripCount = len(stripIds)
+
+    def __contains__(self, pinValue):
+        return pinValue in self.index
+
+    def indices(self, pinValues):
+        try:
+            return np.array([self.index[pinValue] for pinValue in pinValues], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError("no pin %r on %s" % (e.args[0], self.moduleIdRef))
+
+    def coordinates(self, pinValues):
+        # (n, 2) array of the x, y of each pin
+        i = self.indices(pinValues)
+        return np.stack([self.xs[i], self.ys[i]], axis=1)
+
+    def strip(self, pinValue):
+        return int(self.strips[self.indices([pinValue])[0]])
+
+    def point(self, pinValue):
+        i = self.indices([pinValue])[0]
+        return Point(float(self.xs[i]), float(self.ys[i]))
+
+# 63 strips and two rails a side, with holes in groups of five: 830 points
+BREADBOARD = BreadboardGeometry("Breadboard-RSR03MB102-ModuleID", 63,
+    [number for number in range(3, 62) if (number - 3) % 6 != 5])
+# moduleIdRef -> geometry, for the boards a netlist may name as its "board"
+BREADBOARDS = {BREADBOARD.moduleIdRef : BREADBOARD}
+
+def netlistBoard(netlist):
+    moduleIdRef = netlist.get("board", BREADBOARD.moduleIdRef)
+    try:
+        return BREADBOARDS[moduleIdRef]
+    except KeyError:
+        raise KeyError("no breadboard geometry for %r" % moduleIdRef)
+
+def getWireCoordinate(pinValue0, pinValue1, board=BREADBOARD):
+    (x0, y0), (x1, y1) = board.coordinates([pinValue0, pinValue1]).tolist()
+
+    x = x0 + 19
+    y = y0 + 4
+    x2 = x1 - x0
+    y2 = y1 - y0
+
+    wire_points = DoublePoint(x, y, x2, y2)
+    return wire_points
+
+def getCoordinate(pinValue, board=BREADBOARD):
+    return board.point(pinValue)
+
+XIncrement = 70.0
+YIncrement = 70.0
+
+# A netlist is a JSON object of components placed on the breadboard and the
+# wires between breadboard pins, built in the order listed. An optional "board"
+# names the breadboard's moduleIdRef, one of BREADBOARDS:
+#
+#   {"components": [{"type": "power", "title": "power", "pins": ["pin4Z", "pin3W"]},
+#                   {"type": "resistor", "title": "resistor_1", "pins": ["pin8E", "pin12E"], "resistance": 200},
+#                   {"type": "wire", "pins": ["pin3X", "pin3Z"]}],
+#    "connections": [["pin6W", "pin8C"]]}
+#
+# each connection is a wire added after all the components.
+#power0VConnector = "connector0"
+#powerPositiveConnector = "connector1"
+#powerNegativeConnector = "connector2"
+
+BLANK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blank.fz")
+
+# view element name -> layer of its parts' connectors
+VIEWS = (("schematicView", "schematic"), ("breadboardView", "breadboard"), ("pcbView", "copper0"))
+# view element name -> layer of the wires and traces in it
+WIRE_LAYERS = {"schematicView" : "schematicTrace", "breadboardView" : "breadboardWire", "pcbView" : "copper0trace"}
+
+class FritzingDocument(object):
+    """A Fritzing sketch being built on top of blank.fz, on the breadboard board.
+
+    Instances are indexed by title and by modelIndex, and connectors by
+    (modelIndex, view, connectorId), so looking one up does not scan the tree.
+    The indexes are kept up to date by addInstance and connector, which is how
+    everything in this module adds to the document.
+    """
+
+    def __init__(self, template=BLANK, board=BREADBOARD):
+        self.template = template
+        self.board = board
+        self.tree = ET.parse(template)
+        self.root = self.tree.getroot()
+        self.instancesElement = self.root.find("instances")
+        self.nextIndex = 1
+        self.byTitle = {}
+        self.byIndex = {}
+        self.connectorsByView = {}
+        self.connectorsById = {}
+        self.prototypes = {}
+
+    def addInstance(self, moduleIdRef, title, geometry, properties):
+        modelIndex = str(self.nextIndex)
+
+        #create new instance and increment index
+        newinstance = ET.SubElement(self.instancesElement, "instance", {"moduleIdRef" : moduleIdRef, "modelIndex" : modelIndex})
+        self.nextIndex += 1
+
+        #add properties, if any
+        for key, value in properties.items():
+            ET.SubElement(newinstance, "property", {"name" : key, "value" : value})
+
+        #add modulename as title
+        newtitle = ET.SubElement(newinstance, "title")
+        newtitle.text = title
+
+        #add views and geometries
+        newviews = ET.SubElement(newinstance, "views")
+        for view, layer in VIEWS:
+            newview = ET.SubElement(newviews, view, {"layer" : layer})
+            ET.SubElement(newview, "geometry", geometry)
+
+        self.byTitle[title] = newinstance
+        self.byIndex[modelIndex] = newinstance
+        return modelIndex
+
+    def prototype(self, key, build, fieldNames):
+        # the Prototype of the instance build(doc, fields) adds, built in a scratch document on first use
+        prototype = self.prototypes.get(key)
+        if prototype is None:
+            scratch = FritzingDocument(self.template, self.board)
+            element = scratch.instanceByIndex(build(scratch, dict((name, "{%s}" % name) for name in fieldNames)))
+            element.set("modelIndex", "{modelIndex}")
+            prototype = Prototype(element,
+                [(view, conns) for (index, view), conns in scratch.connectorsByView.items()],
+                [(view, connectorId, conn) for (index, view, connectorId), conn in scratch.connectorsById.items()])
+            self.prototypes[key] = prototype
+        return prototype
+
+    def addInstances(self, prototype, rows):
+        # a clone of prototype for each dict of fields in rows, added in order; returns their modelIndexes
+        modelIndexes = []
+        newinstances = []
+        for fields in rows:
+            modelIndex = str(self.nextIndex)
+            self.nextIndex += 1
+            newinstance, elements = prototype.clone(fields, modelIndex)
+            self.byTitle[fields["title"]] = newinstance
+            self.byIndex[modelIndex] = newinstance
+            for pos, view in prototype.connectorsByView:
+                self.connectorsByView[(modelIndex, view)] = elements[pos]
+            for pos, view, connectorId in prototype.connectorsById:
+                self.connectorsById[(modelIndex, view, connectorId)] = elements[pos]
+            modelIndexes.append(modelIndex)
+            newinstances.append(newinstance)
+        self.instancesElement.extend(newinstances)
+        return modelIndexes
+
+    def instance(self, title):
+        try:
+            return self.byTitle[title]
+        except KeyError:
+            raise KeyError("no instance titled %r" % title)
+
+    def instanceByIndex(self, modelIndex):
+        try:
+            return self.byIndex[str(modelIndex)]
+        except KeyError:
+            raise KeyError("no instance with modelIndex %r" % modelIndex)
+
+    def connectors(self, instance, view):
+        # the <connectors> element of one view of an instance, created on first use
+        key = (instance.get("modelIndex"), view)
+        conns = self.connectorsByView.get(key)
+        if conns is None:
+            conns = ET.SubElement(instance.find("views").find(view), "connectors")
+            self.connectorsByView[key] = conns
+        return conns
+
+    def connector(self, instance, view, connectorId, layer):
+        # the <connector> for connectorId in one view of an instance, created with layer on first use
+        key = (instance.get("modelIndex"), view, connectorId)
+        conn = self.connectorsById.get(key)
+        if conn is None:
+            conn = ET.SubElement(self.connectors(instance, view), "connector", {"connectorId" : connectorId, "layer" : layer})
+            self.connectorsById[key] = conn
+        return conn
+
+    def findConnector(self, instance, view, connectorId):
+        return self.connectorsById.get((instance.get("modelIndex"), view, connectorId))
+
+    def modelIndex(self, instance):
+        return instance.get("modelIndex")
+
+    def geometry(self, instance, view):
+        return instance.find("views").find(view).find("geometry").attrib
+
+    def connect(self, conn, otherId, otherIndex, otherLayer):
+        # records that connector element conn connects to connector otherId of instance otherIndex
+        connects = conn.find("connects")
+        if connects is None:
+            connects = ET.SubElement(conn, "connects")
+        ET.SubElement(connects, "connect", {"connectorId" : otherId, "modelIndex" : otherIndex, "layer" : otherLayer})
+
+    def addLeg(self, conn, points):
+        appendLeg(conn, points)
+
+    def save(self, f):
+        self.tree.write(f)
+
+    def write(self, path):
+        with openOutput(path) as f:
+            self.save(f)
+
+def appendLeg(conn, points):
+    # a <leg> through points, each followed by a straight (empty) bezier
+    c_leg = ET.SubElement(conn, "leg")
+    for x, y in points:
+        c_leg.append(ET.Element("point", {"x": str(x), "y": str(y)}))
+        c_leg.append(ET.Element("bezier"))
+
+def openOutput(path):
+    # a binary file for path, or for the .fz inside it when path is a zipped .fzz
+    if not path.lower().endswith(".fzz"):
+        return open(path, "wb")
+    archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+    name = os.path.splitext(os.path.basename(path))[0] + ".fz"
+    entry = archive.open(name, "w")
+    close = entry.close
+    def closeBoth():
+        close()
+        archive.close()
+    entry.close = closeBoth
+    return entry
+
+class Prototype(object):
+    """An instance subtree built once with "{field}" placeholders where parts differ.
+
+    clone deep-copies the subtree and fills the placeholders in, which for a
+    part with its connectors is several times cheaper than building it element
+    by element. Positions are indexes into the subtree's iter() order.
+    """
+
+    __slots__ = ("element", "slots", "connectorsByView", "connectorsById")
+
+    def __init__(self, element, connectorsByView, connectorsById):
+        positions = {}
+        self.slots = []
+        for pos, e in enumerate(element.iter()):
+            positions[id(e)] = pos
+            for name, value in e.items():
+                if value.startswith("{") and value.endswith("}"):
+                    self.slots.append((pos, name, value[1:-1]))
+            if e.text and e.text.startswith("{") and e.text.endswith("}"):
+                self.slots.append((pos, None, e.text[1:-1]))
+        self.element = element
+        self.connectorsByView = [(positions[id(conns)], view) for view, conns in connectorsByView]
+        self.connectorsById = [(positions[id(conn)], view, connectorId) for view, connectorId, conn in connectorsById]
+
+    def clone(self, fields, modelIndex):
+        # the filled in copy and its elements in iter() order
+        # straight to the C deepcopy, skipping copy.deepcopy's memo bookkeeping
+        element = self.element.__deepcopy__({})
+        elements = list(element.iter())
+        for pos, name, field in self.slots:
+            value = modelIndex if field == "modelIndex" else fields[field]
+            if name is None:
+                elements[pos].text = value
+            else:
+                elements[pos].set(name, value)
+        return element, elements
+
+class StreamInstance(object):
+    # what StreamingFritzingDocument keeps of an instance until it is written
+    __slots__ = ("moduleIdRef", "modelIndex", "title", "properties", "geometry", "views")
+
+    def __init__(self, moduleIdRef, modelIndex, title, geometry, properties):
+        self.moduleIdRef = moduleIdRef
+        self.modelIndex = modelIndex
+        self.title = title
+        self.properties = list(properties.items())
+        self.geometry = dict(geometry)
+        # view -> {connectorId: StreamConnector}, in the order they were added
+        self.views = {}
+
+class StreamConnector(object):
+    # children are ("connects", [(connectorId, modelIndex, layer)]) and ("leg", [(x, y)]) in document order
+    __slots__ = ("connectorId", "layer", "children", "connects")
+
+    def __init__(self, connectorId, layer):
+        self.connectorId = connectorId
+        self.layer = layer
+        self.children = []
+        self.connects = None
+
+class StreamingFritzingDocument(object):
+    """FritzingDocument for large generated boards.
+
+    Keeps each instance as a StreamInstance (its title, geometry, properties and
+    connections) rather than a tree of elements, and write() streams the instances
+    one at a time between the two halves of the serialized template, to a .fz or a
+    zipped .fzz. The output is byte-for-byte what FritzingDocument writes for the
+    same calls.
+    """
+
+    def __init__(self, template=BLANK, board=BREADBOARD):
+        self.board = board
+        tree = ET.parse(template)
+        # the template serialized around a marker where the instances go
+        marker = ET.SubElement(tree.getroot().find("instances"), "streamedInstances")
+        text = ET.tostring(tree.getroot())
+        self.head, self.tail = text.split(ET.tostring(marker), 1)
+        self.nextIndex = 1
+        self.instances = []
+        self.byTitle = {}
+        self.byIndex = {}
+
+    def addInstance(self, moduleIdRef, title, geometry, properties):
+        modelIndex = str(self.nextIndex)
+        self.nextIndex += 1
+        newinstance = StreamInstance(moduleIdRef, modelIndex, title, geometry, properties)
+        self.instances.append(newinstance)
+        self.byTitle[title] = newinstance
+        self.byIndex[modelIndex] = newinstance
+        return modelIndex
+
+    def prototype(self, key, build, fieldNames):
+        # instances are not element trees until written, so there is nothing to clone
+        return build
+
+    def addInstances(self, prototype, rows):
+        return [prototype(self, fields) for fields in rows]
+
+    def instance(self, title):
+        try:
+            return self.byTitle[title]
+        except KeyError:
+            raise KeyError("no instance titled %r" % title)
+
+    def instanceByIndex(self, modelIndex):
+        try:
+            return self.byIndex[str(modelIndex)]
+        except KeyError:
+            raise KeyError("no instance with modelIndex %r" % modelIndex)
+
+    def connectors(self, instance, view):
+        return instance.views.setdefault(view, {})
+
+    def connector(self, instance, view, connectorId, layer):
+        conns = self.connectors(instance, view)
+        conn = conns.get(connectorId)
+        if conn is None:
+            conn = conns[connectorId] = StreamConnector(connectorId, layer)
+        return conn
+
+    def findConnector(self, instance, view, connectorId):
+        return instance.views.get(view, {}).get(connectorId)
+
+    def modelIndex(self, instance):
+        return instance.modelIndex
+
+    def geometry(self, instance, view):
+        return instance.geometry
+
+    def connect(self, conn, otherId, otherIndex, otherLayer):
+        if conn.connects is None:
+            conn.connects = []
+            conn.children.append(("connects", conn.connects))
+        conn.connects.append((otherId, otherIndex, otherLayer))
+
+    def addLeg(self, conn, points):
+        conn.children.append(("leg", list(points)))
+
+    def instanceElement(self, instance):
+        # the <instance> FritzingDocument would hold for instance
+        element = ET.Element("instance", {"moduleIdRef" : instance.moduleIdRef, "modelIndex" : instance.modelIndex})
+        for key, value in instance.properties:
+            ET.SubElement(element, "property", {"name" : key, "value" : value})
+        ET.SubElement(element, "title").text = instance.title
+        views = ET.SubElement(element, "views")
+        for view, layer in VIEWS:
+            viewElement = ET.SubElement(views, view, {"layer" : layer})
+            ET.SubElement(viewElement, "geometry", instance.geometry)
+            if view not in instance.views:
+                continue
+            conns = ET.SubElement(viewElement, "connectors")
+            for conn in instance.views[view].values():
+                connElement = ET.SubElement(conns, "connector", {"connectorId" : conn.connectorId, "layer" : conn.layer})
+                for kind, values in conn.children:
+                    if kind == "connects":
+                        connects = ET.SubElement(connElement, "connects")
+                        for otherId, otherIndex, otherLayer in values:
+                            ET.SubElement(connects, "connect", {"connectorId" : otherId, "modelIndex" : otherIndex, "layer" : otherLayer})
+                    else:
+                        appendLeg(connElement, values)
+        return element
+
+    def save(self, f):
+        f.write(self.head)
+        for instance in self.instances:
+            f.write(ET.tostring(self.instanceElement(instance)))
+        f.write(self.tail)
+
+    def write(self, path):
+        with openOutput(path) as f:
+            self.save(f)
+
+# connector0 is always the default "starting" position of the resistor
+def getResistorPinOffset(doc, modulename, connector, pinValueTarget):
+
+    module = doc.instance(modulename)
+    geometry = doc.geometry(module, "breadboardView")
+
+    return resistorPinOffset(connector, geometry.get("x"), geometry.get("y"), pinValueTarget, doc.board)
+
+def resistorPinOffset(connector, x, y, pinValueTarget, board=BREADBOARD):
+    # pinStart will be at x="-1.3095" y="0" in reference to the resistor's "origin"
+    pinStart = Point(x,y)
+    pinTarget = getCoordinate(pinValueTarget, board)
+
+    xDiff = float(pinTarget.x) - float(pinStart.x)
+    yDiff = float(pinTarget.y) - float(pinStart.y)
+
+    if connector == "connector0":
+        x_coord = -1.3095 + xDiff + 18
+    else:
+        x_coord = 1.3095 + xDiff - 18
+    y_coord = 0 + yDiff
+
+    pin_point = Point(x_coord, y_coord)
+    return pin_point
+
+# Resistors, power and wires are cloned from a per-document Prototype, built by the
+# build* functions below with the same calls addtoBreadboard, insertResistorPins and
+# addWire make; every value in fields is a string.
+
+LEAD_FIELDS = ("title", "breadboard", "pin0", "pin1", "leg0x", "leg0y", "leg1x", "leg1y")
+RESISTOR_FIELDS = LEAD_FIELDS + ("x", "y", "resistance")
+WIRE_FIELDS = ("title", "breadboard", "pin0", "pin1", "x", "y", "x2", "y2")
+
+def buildLeads(doc, modelIndex, fields):
+    # the part's side of connector0 and connector1 on breadboard pins pin0 and pin1, with their legs
+    module = doc.instanceByIndex(modelIndex)
+    for n in range(2):
+        for view, layer in VIEWS:
+            conn = doc.connector(module, view, "connector%d" % n, layer)
+            doc.connect(conn, fields["pin%d" % n], fields["breadboard"], WIRE_LAYERS[view])
+    for n in range(2):
+        c_b = doc.findConnector(module, "breadboardView", "connector%d" % n)
+        addLeg(doc, c_b, (fields["leg%dx" % n], fields["leg%dy" % n]))
+
+def buildResistor(doc, fields):
+    modelIndex = doc.addInstance("ResistorModuleID", fields["title"], {"x" : fields["x"], "y" : fields["y"], "z" : "2.5"},
+        {"resistance" : fields["resistance"]})
+    buildLeads(doc, modelIndex, fields)
+    return modelIndex
+
+def buildPower(doc, fields):
+    modelIndex = doc.addInstance("1000AFDF10011leg", fields["title"], {"z" : "1.5", "x" : "-250", "y" : "75"}, {})
+    buildLeads(doc, modelIndex, fields)
+    return modelIndex
+
+def connectBreadboard(doc, modelIndex, pinValue0, pinValue1, breadboard="breadboard_hi"):
+    # the breadboard's side of connecting connector0 and connector1 of modelIndex to two of its pins
+    board = doc.instance(breadboard)
+    for connector, pinValue in (("connector0", pinValue0), ("connector1", pinValue1)):
+        for view, layer in VIEWS:
+            doc.connect(doc.connector(board, view, pinValue, layer), connector, modelIndex, WIRE_LAYERS[view])
+
+def addResistors(doc, resistors, breadboard="breadboard_hi"):
+    # resistors is (title, pin1, pin2, resistance) tuples, added in one batch
+    resistors = list(resistors)
+    boardIndex = doc.modelIndex(doc.instance(breadboard))
+    rows = []
+    for title, pin1, pin2, resistance in resistors:
+        # place resistor in midpoint between pins
+        pin1_coord = getCoordinate(pin1, doc.board)
+        pin2_coord = getCoordinate(pin2, doc.board)
+        x = (pin1_coord.x + pin2_coord.x)/2
+        y = (pin1_coord.y + pin2_coord.y)/2
+        leg0 = resistorPinOffset("connector0", x, y, pin1, doc.board)
+        leg1 = resistorPinOffset("connector1", x, y, pin2, doc.board)
+        rows.append({"title" : title, "breadboard" : boardIndex, "pin0" : pin1, "pin1" : pin2,
+                     "leg0x" : str(leg0.x), "leg0y" : str(leg0.y), "leg1x" : str(leg1.x), "leg1y" : str(leg1.y),
+                     "x" : str(x), "y" : str(y), "resistance" : str(resistance)})
+    modelIndexes = doc.addInstances(doc.prototype("resistor", buildResistor, RESISTOR_FIELDS), rows)
+    for modelIndex, (title, pin1, pin2, resistance) in zip(modelIndexes, resistors):
+        connectBreadboard(doc, modelIndex, pin1, pin2, breadboard)
+
+def addResistor(doc, title, pin1, pin2, resistance):
+    addResistors(doc, [(title, pin1, pin2, resistance)])
+
+
+# not supported rn
+def addCapacitor(doc, title, x, y, capacitance):
+    doc.addInstance("100milCeramicCapacitorModuleID", title, {"x" : str(x), "y" : str(y), "z" : "2.5"}, {"capacitance" : str(capacitance)})
+
+
+# modulename1 = resistor
+# connectorID1 = resistor pin (ex: connector0, connector1)
+# modulename2 = breadboard
+# connectorID2 = breadboard pin (ex: pin34J)
+# NEED TO ALWAYS assign connector0 of resistor before connector1 OR IT WON'T WORK
+# visually, connector0 is the right side and connector1 is the left side of a resistor place on the breadboard
+
+def addtoBreadboard(doc, modulename1, connectorID1, modulename2, connectorID2):
+
+    m1 = doc.instance(modulename1)
+    m2 = doc.instance(modulename2)
+
+    modelIndex1 = doc.modelIndex(m1)
+    modelIndex2 = doc.modelIndex(m2)
+
+    #specify connections between wire instance and both end connectors
+    for view, layer in VIEWS:
+        doc.connect(doc.connector(m1, view, connectorID1, layer), connectorID2, modelIndex2, WIRE_LAYERS[view])
+    for view, layer in VIEWS:
+        doc.connect(doc.connector(m2, view, connectorID2, layer), connectorID1, modelIndex1, WIRE_LAYERS[view])
+
+def addLeg(doc, c_b, offset_coord):
+    # for end of the pin -> need to go to
+    # breadboardview / connectors / connector / leg / the 2nd point in the leg changes where the resistor pin connects to
+    doc.addLeg(c_b, [("0", "0"), offset_coord])
+
+# resistor title, connector0, connector1
+def insertResistorPins(doc, modulename, pinValue0, pinValue1):
+    module = doc.instance(modulename)
+
+    for connector in ["connector0", "connector1"]:
+        c_b = doc.findConnector(module, "breadboardView", connector)
+
+        if connector == "connector0":
+            offset_coord = getResistorPinOffset(doc, modulename, connector, pinValue0)
+        else:
+            offset_coord = getResistorPinOffset(doc, modulename, connector, pinValue1)
+        addLeg(doc, c_b, offset_coord)
+
+# hardcoded coordinate for power, whose legs reach pin4Z and pin3W from where it sits
+POWER_LEGS = {"connector0" : Point(44, -16-9*8), "connector1" : Point(35, 10+9*10)}
+POWER_PINS = {"connector0" : "pin4Z", "connector1" : "pin3W"}
+
+def powerPinOffset(connector, pinValueTarget, board=BREADBOARD):
+    # the leg end for pinValueTarget: the hardcoded one, moved by the target's distance from its pin
+    leg = POWER_LEGS[connector]
+    pinStart = getCoordinate(POWER_PINS[connector], board)
+    pinTarget = getCoordinate(pinValueTarget, board)
+    x_coord = leg.x + (pinTarget.x - pinStart.x)
+    y_coord = leg.y + (pinTarget.y - pinStart.y)
+    return Point("%g" % x_coord, "%g" % y_coord)
+
+def insertPowerPins(doc, modulename, pinValue0="pin4Z", pinValue1="pin3W"):
+    module = doc.instance(modulename)
+
+    for connector, pinValue in [("connector0", pinValue0), ("connector1", pinValue1)]:
+        c_b = doc.findConnector(module, "breadboardView", connector)
+
+        addLeg(doc, c_b, powerPinOffset(connector, pinValue, doc.board))
+
+
+def buildWire(doc, fields):
+    wireId = doc.addInstance("WireModuleID", fields["title"],
+        {"x" : fields["x"], "y" : fields["y"], "x1" : "0", "y1" : "0", "x2" : fields["x2"], "y2" : fields["y2"]}, {})
+
+    newWire = doc.instanceByIndex(wireId)
+
+    # for the newly created wire
+    for view, layer in VIEWS:
+        c3 = doc.connector(newWire, view, "connector0", WIRE_LAYERS[view])
+        c4 = doc.connector(newWire, view, "connector1", WIRE_LAYERS[view])
+        doc.connect(c3, fields["pin0"], fields["breadboard"], layer)
+        doc.connect(c4, fields["pin1"], fields["breadboard"], "x" if view == "pcbView" else layer)
+    return wireId
+
+# for simplicity, assume every connection adds a single wire between connectors
+def addWires(doc, modulename1, wires):
+    # wires is (connectorID1, connectorID2) pairs, added in one batch; returns their titles
+    modelIndex1 = doc.modelIndex(doc.instance(modulename1))
+    rows = []
+    for connectorID1, connectorID2 in wires:
+        wirePoints = getWireCoordinate(connectorID1, connectorID2, doc.board)
+        rows.append({"title" : "Wire" + str(doc.nextIndex + len(rows)), "breadboard" : modelIndex1,
+                     "pin0" : connectorID1, "pin1" : connectorID2,
+                     "x" : str(wirePoints.x), "y" : str(wirePoints.y), "x2" : str(wirePoints.x2), "y2" : str(wirePoints.y2)})
+    doc.addInstances(doc.prototype("wire", buildWire, WIRE_FIELDS), rows)
+    return [row["title"] for row in rows]
+
+def addWire(doc, modulename1, connectorID1, connectorID2):
+    return addWires(doc, modulename1, [(connectorID1, connectorID2)])[0]
+
+def addBreadboardConn(doc, modulename, pinValue0, pinValue1):
+    addtoBreadboard(doc, modulename, "connector0", "breadboard_hi", pinValue0)
+    addtoBreadboard(doc, modulename, "connector1", "breadboard_hi", pinValue1)
+
+def addBreadboard(doc):
+    # breadboard (DON'T CHANGE THE COORDINATEs)
+    doc.addInstance(doc.board.moduleIdRef, "breadboard_hi", {"z" : "1.5", "x" : "-38", "y" : "38"}, {})
+
+def addPower(doc, title, pin1, pin2, breadboard="breadboard_hi"):
+    leg0 = powerPinOffset("connector0", pin1, doc.board)
+    leg1 = powerPinOffset("connector1", pin2, doc.board)
+    row = {"title" : title, "breadboard" : doc.modelIndex(doc.instance(breadboard)), "pin0" : pin1, "pin1" : pin2,
+           "leg0x" : str(leg0.x), "leg0y" : str(leg0.y), "leg1x" : str(leg1.x), "leg1y" : str(leg1.y)}
+    modelIndex = doc.addInstances(doc.prototype("power", buildPower, LEAD_FIELDS), [row])[0]
+    connectBreadboard(doc, modelIndex, pin1, pin2, breadboard)
+
+def pins(component, count):
+    values = component.get("pins", [])
+    if len(values) != count:
+        raise ValueError("%s needs %d pins, got %r" % (component.get("type"), count, values))
+    return values
+
+class Nets(object):
+    """Which strips of a board are electrically joined, as a union-find.
+
+    Starts with every strip (a column half or a rail) on its own net; join
+    merges the nets of two pins, by size and with path halving, so a board
+    with n connections takes near-linear time.
+    """
+
+    def __init__(self, board=BREADBOARD):
+        self.board = board
+        self.parent = list(range(board.stripCount))
+        self.size = [1] * board.stripCount
+
+    def find(self, strip):
+        parent = self.parent
+        while parent[strip] != strip:
+            parent[strip] = parent[parent[strip]]
+            strip = parent[strip]
+        return strip
+
+    def net(self, pinValue):
+        return self.find(self.board.strip(pinValue))
+
+    def join(self, pinValue0, pinValue1):
+        # False when the pins were already on the same net
+        a = self.net(pinValue0)
+        b = self.net(pinValue1)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+NetReport = namedtuple("NetReport", "redundant shorts floating")
+
+def pruneNetlist(netlist, board=BREADBOARD):
+    """netlist without the wires that join already connected nets, and a NetReport.
+
+    Wires are kept in the order given, so of a set of wires joining the same
+    nets the first ones stay. redundant lists the dropped wires' pins, shorts
+    the titles of parts with two leads on one net, and floating the titles of
+    parts with a lead on a net nothing else is connected to.
+    """
+    nets = Nets(board)
+    redundant = []
+    components = []
+    parts = []
+    for component in netlist.get("components", []):
+        if component.get("type") == "wire":
+            pin1, pin2 = pins(component, 2)
+            if not nets.join(pin1, pin2):
+                redundant.append((pin1, pin2))
+                continue
+        else:
+            parts.append(component)
+        components.append(component)
+    connections = []
+    for pin1, pin2 in netlist.get("connections", []):
+        if nets.join(pin1, pin2):
+            connections.append([pin1, pin2])
+        else:
+            redundant.append((pin1, pin2))
+
+    leads = {}
+    partNets = []
+    for part in parts:
+        partNet = [nets.net(pinValue) for pinValue in part.get("pins", [])]
+        for net in partNet:
+            leads[net] = leads.get(net, 0) + 1
+        partNets.append(partNet)
+    shorts = []
+    floating = []
+    for part, partNet in zip(parts, partNets):
+        title = part.get("title", part.get("type"))
+        if len(set(partNet)) < len(partNet):
+            shorts.append(title)
+        if any(leads[net] == 1 for net in partNet):
+            floating.append(title)
+
+    pruned = dict(netlist)
+    pruned["components"] = components
+    pruned["connections"] = connections
+    return pruned, NetReport(redundant, shorts, floating)
+
+class Router(object):
+    """Places wire ends on free breadboard holes.
+
+    occupied is a bitmap over the holes of board, set as parts are placed and
+    wires routed. route moves each end of a wire to a free hole on the same
+    net (any strip already joined to the requested one by an earlier wire),
+    choosing the pair that gives the shortest jumper and keeping the requested
+    holes on ties. A wire with no free hole left on one of its nets keeps its
+    requested holes and is listed in unrouted.
+    """
+
+    def __init__(self, board=BREADBOARD):
+        self.board = board
+        self.occupied = np.zeros(len(board.names), dtype=bool)
+        order = np.argsort(board.strips, kind="stable")
+        bounds = np.searchsorted(board.strips[order], np.arange(board.stripCount + 1))
+        self.stripHoles = [order[bounds[i]:bounds[i + 1]] for i in range(board.stripCount)]
+        self.nets = Nets(board)
+        # net -> its strips
+        self.members = dict((strip, [strip]) for strip in range(board.stripCount))
+        self.unrouted = []
+
+    def place(self, pinValues):
+        self.occupied[self.board.indices(pinValues)] = True
+
+    def freeHoles(self, net):
+        holes = np.concatenate([self.stripHoles[strip] for strip in self.members[net]])
+        return holes[~self.occupied[holes]]
+
+    def route(self, pinValue0, pinValue1):
+        # the pins a wire from pinValue0's net to pinValue1's should use; they are then occupied
+        board = self.board
+        requested = board.indices([pinValue0, pinValue1])
+        net0 = self.nets.net(pinValue0)
+        net1 = self.nets.net(pinValue1)
+        if net0 == net1:
+            # already joined; left for pruneNetlist to drop, but its holes are taken if it stays
+            self.occupied[requested] = True
+            return pinValue0, pinValue1
+        holes0 = self.freeHoles(net0)
+        holes1 = self.freeHoles(net1)
+        if len(holes0) and len(holes1):
+            lengths = np.hypot(board.xs[holes0][:, None] - board.xs[holes1][None, :],
+                               board.ys[holes0][:, None] - board.ys[holes1][None, :])
+            # one moved end costs less than two
+            moved = (holes0 != requested[0]).astype(int)[:, None] + (holes1 != requested[1]).astype(int)[None, :]
+            i, j = np.unravel_index(np.argmin(lengths + 1e-6 * moved), lengths.shape)
+            ends = [holes0[i], holes1[j]]
+        else:
+            self.unrouted.append((pinValue0, pinValue1))
+            ends = list(requested)
+        self.occupied[ends] = True
+
+        self.nets.join(pinValue0, pinValue1)
+        members = self.members.pop(net0) + self.members.pop(net1)
+        self.members[self.nets.net(pinValue0)] = members
+        return board.names[ends[0]], board.names[ends[1]]
+
+def routeNetlist(netlist, board=BREADBOARD):
+    """netlist with its wires moved onto free holes by a Router, and the wires it
+    could not move (see Router.unrouted).
+
+    The parts' leads are placed first, then the wires are routed in order.
+    """
+    router = Router(board)
+    for component in netlist.get("components", []):
+        if component.get("type") != "wire":
+            router.place(component.get("pins", []))
+    components = []
+    for component in netlist.get("components", []):
+        if component.get("type") == "wire":
+            component = dict(component, pins=list(router.route(*pins(component, 2))))
+        components.append(component)
+    routed = dict(netlist)
+    routed["components"] = components
+    routed["connections"] = [list(router.route(pin1, pin2)) for pin1, pin2 in netlist.get("connections", [])]
+    return routed, router.unrouted
+
+def addNetlist(doc, netlist):
+    addBreadboard(doc)
+    # runs of components of one type are added as a batch
+    for kind, run in itertools.groupby(netlist.get("components", []), lambda component: component.get("type")):
+        if kind == "resistor":
+            addResistors(doc, [(component["title"],) + tuple(pins(component, 2)) + (component.get("resistance", 200),)
+                               for component in run])
+        elif kind == "power":
+            for component in run:
+                pin1, pin2 = pins(component, 2)
+                addPower(doc, component.get("title", "power"), pin1, pin2)
+        elif kind == "wire":
+            addWires(doc, "breadboard_hi", [pins(component, 2) for component in run])
+        else:
+            raise ValueError("unsupported component type %r" % kind)
+    addWires(doc, "breadboard_hi", netlist.get("connections", []))
+
+def convert(netlist, streaming=False, template=BLANK, prune=True, route=False):
+    """The .fz document for netlist, a parsed netlist or its JSON text, as bytes.
+
+    With prune, wires that join already connected nets are left out (see
+    pruneNetlist), and with route the rest are moved onto free holes (see
+    routeNetlist). The breadboard is the one netlist names as "board", by
+    default BREADBOARD. Every call builds its own document, so convert can run
+    in several threads or processes at once.
+    """
+    if isinstance(netlist, (str, bytes)):
+        netlist = json.loads(netlist)
+    board = netlistBoard(netlist)
+    if prune:
+        netlist = pruneNetlist(netlist, board)[0]
+    if route:
+        netlist = routeNetlist(netlist, board)[0]
+    doc = StreamingFritzingDocument(template, board) if streaming else FritzingDocument(template, board)
+    addNetlist(doc, netlist)
+    f = io.BytesIO()
+    doc.save(f)
+    return f.getvalue()
+
+WHEATSTONE = {
+    "components": [
+        {"type": "power", "title": "power", "pins": ["pin4Z", "pin3W"]},
+        {"type": "wire", "pins": ["pin3X", "pin3Z"]},
+        {"type": "wire", "pins": ["pin4W", "pin4Y"]},
+        # wheatstone bridge example
+        {"type": "resistor", "title": "resistor_1", "pins": ["pin8E", "pin12E"], "resistance": 200},
+        {"type": "resistor", "title": "resistor_2", "pins": ["pin8A", "pin13A"], "resistance": 200},
+        {"type": "resistor", "title": "resistor_3", "pins": ["pin12B", "pin13A"], "resistance": 200},
+        {"type": "resistor", "title": "resistor_4", "pins": ["pin12C", "pin18B"], "resistance": 200},
+        {"type": "resistor", "title": "resistor_5", "pins": ["pin13E", "pin18E"], "resistance": 200},
+    ],
+    "connections": [["pin6W", "pin8C"], ["pin18A", "pin18X"]],
+}
+
+def wheatstoneExample(doc):
+    addNetlist(doc, WHEATSTONE)
+
+def findNetlists(inputs):
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".json"))
+        else:
+            paths.append(path)
+    return sorted(set(paths))
+
+def convertFile(task):
+    # (input, output, streaming, prune, route) -> (input, error or None, warnings), for the process pool
+    path, output, streaming, prune, route = task
+    try:
+        with open(path) as f:
+            netlist = json.load(f)
+        board = netlistBoard(netlist)
+        pruned, report = pruneNetlist(netlist, board)
+        warnings = ["shorted: %s" % title for title in report.shorts]
+        warnings += ["floating: %s" % title for title in report.floating]
+        if prune:
+            warnings += ["dropped redundant wire %s-%s" % wire for wire in report.redundant]
+            netlist = pruned
+        if route:
+            netlist, unrouted = routeNetlist(netlist, board)
+            warnings += ["no free hole to route wire %s-%s, kept as given" % wire for wire in unrouted]
+        data = convert(netlist, streaming, prune=False)
+        with openOutput(output) as f:
+            f.write(data)
+        return path, None, warnings
+    except Exception as e:
+        return path, "%s: %s" % (type(e).__name__, e), []
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description="Convert netlist JSON files to Fritzing sketches.")
+    parser.add_argument("inputs", nargs="*", help="netlist JSON files or directories of them")
+    parser.add_argument("-o", "--output", default=".", help="directory to write the sketches to (default: .)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--fzz", action="store_true", help="write zipped .fzz sketches instead of .fz")
+    parser.add_argument("--streaming", action="store_true", help="build with StreamingFritzingDocument, for large boards")
+    parser.add_argument("--keep-redundant", action="store_true",
+                        help="keep wires that join already connected nets")
+    parser.add_argument("--route", action="store_true",
+                        help="move wire ends onto free holes, for the shortest jumpers")
+    parser.add_argument("--example", action="store_true", help="also write the Wheatstone bridge example as testout1")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.example:
+        parser.error("no netlists given")
+    return args
+
+def main(argv=None):
+    args = parseArgs(sys.argv[1:] if argv is None else argv)
+    extension = ".fzz" if args.fzz else ".fz"
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    if args.example:
+        with openOutput(os.path.join(args.output, "testout1" + extension)) as f:
+            f.write(convert(WHEATSTONE, args.streaming, prune=not args.keep_redundant, route=args.route))
+
+    tasks = [(path, os.path.join(args.output, os.path.splitext(os.path.basename(path))[0] + extension),
+              args.streaming, not args.keep_redundant, args.route)
+             for path in findNetlists(args.inputs)]
+    failed = 0
+    pool = multiprocessing.Pool(args.workers)
+    try:
+        for path, error, warnings in pool.imap_unordered(convertFile, tasks):
+            for warning in warnings:
+                sys.stderr.write("%s: warning: %s\n" % (path, warning))
+            if error is not None:
+                failed += 1
+                sys.stderr.write("%s: %s\n" % (path, error))
+    finally:
+        pool.close()
+        pool.join()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+# Helpers shared by the bench_*.py scripts: timing a call, measuring its peak memory
+# and writing a report as JSON.
+
+import json
+import time
+import tracemalloc
+
+def timed(function, *args, **kwargs):
+    # (function's result, wall seconds it took)
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def peak_bytes(function, *args, **kwargs):
+    """Peak bytes traced by tracemalloc while function runs.
+
+    Tracing slows allocation down severalfold, so call this in a run of its own rather
+    than on a call that is also being timed.
+    """
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def write_report(report, output=None):
+    # report as indented JSON to the file output, or to stdout
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Detection benchmark on synthetic circuits: pastes the components/*.png templates at
+# known positions and pyramid scales onto blank canvases of increasing size, then times
+# pyramid, find_objects, sliding_window, the per-level scan and pyramid_find_objects_multi,
+# and scores recall against the pasted ground truth, along with the per-stage times and
+# peak memory of the multi-template scan.
+#
+#   python3 bench_detection.py --sizes 480x640,960x1280 -o bench.json
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from skimage.transform import rescale
+from skimage.util import img_as_float
+
+import cs347
+from bench_common import peak_bytes, timed, write_report
+
+# a detection matches a pasted component of its class at this intersection over union
+MATCH_IOU = 0.3
+
+def parse_sizes(text):
+    return [tuple(int(n) for n in size.split("x")) for size in text.split(",")]
+
+def synthetic_circuit(shape, count, templates, images, scales, rng, attempts=200):
+    """Blank canvas with up to count components pasted on it without overlap.
+
+    Each component is its template image enlarged by 1 / s for a pyramid scale s, so it
+    lines up with the template window on that level. Returns the canvas and the ground
+    truth as (class, (top, left, bottom, right), s) tuples.
+    """
+    canvas = np.ones(shape)
+    truth = []
+    for n in range(count):
+        template = templates[rng.integers(len(templates))]
+        s = scales[rng.integers(len(scales))]
+        part = rescale(images[template.name], 1.0 / s) if s != 1.0 else images[template.name]
+        h, w = part.shape
+        if h >= shape[0] or w >= shape[1]:
+            continue
+        for attempt in range(attempts):
+            top = int(rng.integers(shape[0] - h))
+            left = int(rng.integers(shape[1] - w))
+            box = (top, left, top + h, left + w)
+            if all(box[2] <= other[0] or other[2] <= box[0] or box[3] <= other[1] or other[3] <= box[1]
+                   for name, other, other_scale in truth):
+                canvas[top:top + h, left:left + w] = np.minimum(canvas[top:top + h, left:left + w], part)
+                truth.append((template.name, box, s))
+                break
+    return canvas, truth
+
+def recall(found, templates, truth):
+    matched = 0
+    for name, box, s in truth:
+        template = [t for t in templates if t.name == name][0]
+        max_score, maxr, maxc, max_scale = found[name]
+        if not max_score:
+            continue
+        boxes = cs347.object_boxes(maxr, maxc, max_scale, template.shape)
+        if np.max(cs347.box_overlaps(np.array(box, dtype=float), boxes, "iou")) >= MATCH_IOU:
+            matched += 1
+    return matched / float(len(truth)) if truth else None
+
+def bench_canvas(canvas, truth, templates, args):
+    stepSize, scale = args.step, args.scale
+    windows = lambda shape: ((shape[0] - 1) // stepSize + 1) * ((shape[1] - 1) // stepSize + 1)
+    wire = dict((t.name, t) for t in templates).get("wire", templates[0])
+    result = {}
+
+    images, result["pyramid_seconds"] = timed(cs347.pyramid, canvas, scale)
+    result["levels"] = []
+    for current_scale, level in images:
+        found, seconds = timed(cs347.find_objects_multi, level, templates, stepSize)
+        evaluated = windows(level.shape) * len(templates)
+        result["levels"].append({
+            "scale": current_scale,
+            "shape": list(level.shape),
+            "windows": evaluated,
+            "seconds": seconds,
+            "windows_per_second": evaluated / seconds,
+        })
+    del images
+
+    for dense in ([True, False] if args.per_window else [True]):
+        engine = "dense" if dense else "per_window"
+        found, seconds = timed(cs347.find_objects, canvas, wire.threshold, wire.base_score, stepSize, wire.shape, dense)
+        result["find_objects_%s_seconds" % engine] = seconds
+        found, seconds = timed(cs347.sliding_window, canvas, wire.base_score, stepSize, wire.shape, dense)
+        result["sliding_window_%s_seconds" % engine] = seconds
+        result["windows_per_second_%s" % engine] = windows(canvas.shape) / seconds
+
+    stats = cs347.DetectionStats()
+    found, result["pyramid_find_objects_multi_seconds"] = timed(
+        cs347.pyramid_find_objects_multi, canvas, templates, stepSize, scale, nms=args.nms, stats=stats,
+        prefilter=args.prefilter)
+    stages = stats.as_dict()
+    del stages["levels"]
+    result["stages"] = stages
+    result["peak_bytes"] = peak_bytes(cs347.pyramid_find_objects_multi, canvas, templates, stepSize, scale,
+                                      nms=args.nms, prefilter=args.prefilter)
+    result["detections"] = sum(len(found[t.name][0]) for t in templates)
+    result["recall"] = recall(found, templates, truth)
+    return result
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark detection on synthetic circuits.")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("480x640,960x1280,1920x2560"),
+                        help="comma separated HxW canvas sizes")
+    parser.add_argument("--counts", type=lambda text: [int(n) for n in text.split(",")], default=[4, 8, 16],
+                        help="components pasted on each canvas, one per size")
+    parser.add_argument("--step", type=int, default=16)
+    parser.add_argument("--scale", type=float, default=0.8)
+    parser.add_argument("--nms", type=float, default=0.0)
+    parser.add_argument("--prefilter", type=lambda text: cs347.Prefilter(*[float(n) for n in text.split(",")]),
+                        default=None, metavar="MIN_INK,MIN_GRADIENT",
+                        help="skip blank windows before HOG in the pyramid_find_objects_multi run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--templates", default="components")
+    parser.add_argument("--per-window", action="store_true",
+                        help="also time the get_hog per window engine (slow on large canvases)")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    rng = np.random.default_rng(args.seed)
+    templates = cs347.load_templates(args.templates)
+    images = dict((name, img_as_float(cs347.read_template_image(os.path.join(args.templates, name + ".png"), factor)))
+                  for name, (factor, threshold) in cs347.COMPONENTS.items())
+    scales = [args.scale ** k for k in range(3)]
+    counts = args.counts + [args.counts[-1]] * (len(args.sizes) - len(args.counts))
+
+    runs = []
+    for shape, count in zip(args.sizes, counts):
+        canvas, truth = synthetic_circuit(shape, count, templates, images, scales, rng)
+        run = {"shape": list(shape), "components": len(truth)}
+        run.update(bench_canvas(canvas, truth, templates, args))
+        runs.append(run)
+        sys.stderr.write("%dx%d: %.2fs, recall %s\n" % (shape[0], shape[1],
+                         run["pyramid_find_objects_multi_seconds"], run["recall"]))
+
+    report = {"step": args.step, "scale": args.scale, "nms": args.nms, "seed": args.seed,
+              "prefilter": args.prefilter and args.prefilter._asdict(), "runs": runs}
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Fritzing export benchmark on synthetic netlists: places random resistors and wires on
+# valid breadboard pins, for boards of increasing size, and times the exporter's stages
+# separately: addInstance, addtoBreadboard and insertResistorPins one part at a time,
+# the batched addResistors and addWire, and writing the document. Per-part times make
+# anything worse than linear stand out.
+#
+#   python3 bench_export.py --sizes 10,100,1000,10000 -o export.json
+
+import argparse
+import io
+import random
+import sys
+
+import ExportToFritzing_CS347 as fritzing
+from bench_common import peak_bytes, timed, write_report
+
+def synthetic_netlist(count, rng, board=fritzing.BREADBOARD):
+    # count resistors and count wires, each between two distinct pins of board
+    components = []
+    for n in range(count):
+        pin1, pin2 = rng.sample(board.names, 2)
+        components.append({"type": "resistor", "title": "resistor_%d" % (n + 1), "pins": [pin1, pin2],
+                           "resistance": rng.choice([100, 200, 470, 1000])})
+    connections = [rng.sample(board.names, 2) for n in range(count)]
+    return {"components": [{"type": "power", "title": "power", "pins": ["pin4Z", "pin3W"]}] + components,
+            "connections": connections}
+
+def resistors(netlist):
+    return [(c["title"], c["pins"][0], c["pins"][1], c["resistance"])
+            for c in netlist["components"] if c["type"] == "resistor"]
+
+def new_document(streaming):
+    doc = fritzing.StreamingFritzingDocument() if streaming else fritzing.FritzingDocument()
+    fritzing.addBreadboard(doc)
+    return doc
+
+def bench_parts(netlist, streaming):
+    # the element by element path, one stage at a time over every resistor
+    doc = new_document(streaming)
+    parts = resistors(netlist)
+    result = {}
+
+    def addInstances():
+        for title, pin1, pin2, resistance in parts:
+            pin1_coord = fritzing.getCoordinate(pin1)
+            pin2_coord = fritzing.getCoordinate(pin2)
+            x = (pin1_coord.x + pin2_coord.x) / 2
+            y = (pin1_coord.y + pin2_coord.y) / 2
+            doc.addInstance("ResistorModuleID", title, {"x": str(x), "y": str(y), "z": "2.5"},
+                            {"resistance": str(resistance)})
+    result["addInstance_seconds"] = timed(addInstances)[1]
+
+    def addtoBreadboard():
+        for title, pin1, pin2, resistance in parts:
+            fritzing.addBreadboardConn(doc, title, pin1, pin2)
+    result["addtoBreadboard_seconds"] = timed(addtoBreadboard)[1]
+
+    def insertResistorPins():
+        for title, pin1, pin2, resistance in parts:
+            fritzing.insertResistorPins(doc, title, pin1, pin2)
+    result["insertResistorPins_seconds"] = timed(insertResistorPins)[1]
+    return result
+
+def bench_batched(netlist, streaming):
+    doc = new_document(streaming)
+    result = {}
+    result["addResistors_seconds"] = timed(fritzing.addResistors, doc, resistors(netlist))[1]
+
+    def addWires():
+        for pin1, pin2 in netlist["connections"]:
+            fritzing.addWire(doc, "breadboard_hi", pin1, pin2)
+    result["addWire_seconds"] = timed(addWires)[1]
+
+    f = io.BytesIO()
+    result["write_seconds"] = timed(doc.save, f)[1]
+    result["output_bytes"] = len(f.getvalue())
+    return result
+
+def bench_netlist(netlist, args):
+    count = len(netlist["connections"])
+    result = {}
+    result.update(bench_parts(netlist, args.streaming))
+    result.update(bench_batched(netlist, args.streaming))
+    for stage in ("addInstance", "addtoBreadboard", "insertResistorPins", "addResistors"):
+        result["%s_per_part_us" % stage] = 1e6 * result["%s_seconds" % stage] / count
+    result["addWire_per_wire_us"] = 1e6 * result["addWire_seconds"] / count
+    result["write_per_instance_us"] = 1e6 * result["write_seconds"] / (2 * count)
+
+    result["convert_seconds"] = timed(fritzing.convert, netlist, args.streaming, fritzing.BLANK, False)[1]
+    result["peak_bytes"] = peak_bytes(fritzing.convert, netlist, args.streaming, fritzing.BLANK, False)
+    return result
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the Fritzing exporter on synthetic netlists.")
+    parser.add_argument("--sizes", type=lambda text: [int(n) for n in text.split(",")], default=[10, 100, 1000, 10000],
+                        help="comma separated resistor counts, each with as many wires")
+    parser.add_argument("--streaming", action="store_true", help="build with StreamingFritzingDocument")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    rng = random.Random(args.seed)
+
+    runs = []
+    for count in args.sizes:
+        run = {"resistors": count, "wires": count}
+        run.update(bench_netlist(synthetic_netlist(count, rng), args))
+        runs.append(run)
+        sys.stderr.write("%d parts: convert %.3fs, %d bytes\n" % (count, run["convert_seconds"], run["output_bytes"]))
+
+    report = {"streaming": args.streaming, "seed": args.seed, "runs": runs}
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
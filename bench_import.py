@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Import-time benchmark: imports a module in fresh interpreters and reports the median
+# wall time and which heavy packages came with it. With --max-seconds, or when a
+# forbidden package gets imported, it exits non-zero, so it can guard the startup of
+# workers and CLIs against regressions.
+#
+#   python3 bench_import.py cs347 --max-seconds 0.5
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from bench_common import write_report
+
+# packages the detection engine should not pull in at import time
+FORBIDDEN = ("matplotlib", "scipy.signal", "scipy.spatial", "scipy.stats", "skimage.io")
+
+PROBE = """import json, sys, time
+start = time.perf_counter()
+import %s
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))"""
+
+def measure(module, python=sys.executable):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.check_output([python, "-c", PROBE % module], cwd=here)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+def imported(modules, packages):
+    return [package for package in packages
+            if any(name == package or name.startswith(package + ".") for name in modules)]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time importing a module in fresh interpreters.")
+    parser.add_argument("modules", nargs="*", default=["cs347"])
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters to start per module")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail above this median import time")
+    parser.add_argument("--forbid", type=lambda text: tuple(text.split(",")) if text else (), default=FORBIDDEN,
+                        help="comma separated packages that must not be imported (default: %s)" % ",".join(FORBIDDEN))
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = []
+    failures = []
+    for module in args.modules:
+        runs = [measure(module) for n in range(args.repeat)]
+        seconds = sorted(run["seconds"] for run in runs)
+        result = {
+            "module": module,
+            "median_seconds": seconds[len(seconds) // 2],
+            "min_seconds": seconds[0],
+            "max_seconds": seconds[-1],
+            "modules_loaded": len(runs[-1]["modules"]),
+            "forbidden_imported": imported(runs[-1]["modules"], args.forbid),
+        }
+        results.append(result)
+        if args.max_seconds is not None and result["median_seconds"] > args.max_seconds:
+            failures.append("%s imports in %.3fs, over %.3fs" % (module, result["median_seconds"], args.max_seconds))
+        if result["forbidden_imported"]:
+            failures.append("%s imports %s" % (module, ", ".join(result["forbidden_imported"])))
+
+    write_report({"repeat": args.repeat, "results": results}, args.output)
+    for failure in failures:
+        sys.stderr.write(failure + "\n")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
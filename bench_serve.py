@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Load test for serve_cs347.py: posts the same drawing from several client threads
+# and reports the p50/p99 latency of the conversions, the throughput and how many
+# requests were turned away with 503.
+#
+#   python3 serve_cs347.py --quiet &
+#   python3 bench_serve.py mypainting.png --requests 200 --concurrency 16 -o serve.json
+
+import argparse
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from bench_common import write_report
+
+def post(url, data):
+    # (status, seconds) of one conversion
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "image/png"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - start
+
+def load(url, data, requests, concurrency):
+    results = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def client():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            result = post(url, data)
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=client) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+def summary(results, seconds):
+    ok = np.array([latency for status, latency in results if status == 200])
+    statuses = {}
+    for status, latency in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    report = {
+        "requests": len(results),
+        "seconds": seconds,
+        "statuses": statuses,
+        "throughput": len(ok) / seconds,
+    }
+    if len(ok):
+        report.update({
+            "p50_seconds": float(np.percentile(ok, 50)),
+            "p99_seconds": float(np.percentile(ok, 99)),
+            "max_seconds": float(ok.max()),
+        })
+    return report
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Load test the drawing to Fritzing service.")
+    parser.add_argument("image", help="PNG drawing to post")
+    parser.add_argument("--url", default="http://127.0.0.1:8347/convert")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=lambda text: [int(n) for n in text.split(",")], default=[1, 4, 16],
+                        help="comma separated client thread counts, one run each")
+    parser.add_argument("--warmup", type=int, default=2, help="requests sent before each run is timed")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    with open(args.image, "rb") as f:
+        data = f.read()
+
+    runs = []
+    for concurrency in args.concurrency:
+        load(args.url, data, args.warmup, 1)
+        results, seconds = load(args.url, data, args.requests, concurrency)
+        run = {"concurrency": concurrency}
+        run.update(summary(results, seconds))
+        runs.append(run)
+        sys.stderr.write("concurrency %d: %.1f/s, p50 %s, p99 %s\n" % (concurrency, run["throughput"],
+                         run.get("p50_seconds"), run.get("p99_seconds")))
+
+    write_report({"url": args.url, "image": args.image, "runs": runs}, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Exactness checks for the detection engine on circuit1.png: the dense HogGrid scores
+# match get_hog on every window, a DetectionSession fed a series of edited snapshots
+# finds what a fresh pyramid_find_objects_multi scan finds, and tiled_find_objects_multi
+# stitches the same detections as the whole-image scan. Prints a line per check and
+# exits with status 1 if any fails.
+#
+#   python3 check_detection.py --step 16
+
+import argparse
+import sys
+
+import numpy as np
+from skimage import io
+
+import cs347
+
+# largest difference allowed between a dense score and get_hog's, relative to the score
+DENSE_TOLERANCE = 1e-7
+
+def same_objects(a, b):
+    # {name: (max_score, maxr, maxc, max_scale)} with equal positions and scales, and scores
+    # equal up to rounding
+    if sorted(a) != sorted(b):
+        return False
+    for name in a:
+        (sa, ra, ca, ka), (sb, rb, cb, kb) = a[name], b[name]
+        if list(ra) != list(rb) or list(ca) != list(cb) or list(ka) != list(kb):
+            return False
+        if not np.allclose(sa, sb, rtol=1e-9, atol=0):
+            return False
+    return True
+
+def check_dense(image, templates, args):
+    # (passed, detail): every window of image scored densely and with get_hog
+    worst = 0.0
+    for template in templates:
+        I, J, dense = cs347.score_windows(image, template.base_score, args.step, template.shape, dense=True)
+        I, J, exact = cs347.score_windows(image, template.base_score, args.step, template.shape, dense=False)
+        worst = max(worst, float(np.max(np.abs(dense - exact) / np.maximum(np.abs(exact), 1.0))))
+    return worst <= DENSE_TOLERANCE, "largest relative difference %.2g" % worst
+
+def snapshots(image):
+    # the image as it is drawn on: a stroke added, a part rubbed out, then put back
+    edited = image.copy()
+    edited[40:44, 20:300] = 0
+    yield edited.copy()
+    edited[150:260, 300:420] = 1
+    yield edited.copy()
+    yield image
+
+def check_session(image, templates, args):
+    session = cs347.DetectionSession(templates, args.step, args.scale, nms=args.nms)
+    for n, snapshot in enumerate(snapshots(image)):
+        session.update(snapshot)
+        fresh = cs347.pyramid_find_objects_multi(snapshot, templates, args.step, args.scale, nms=args.nms)
+        if not same_objects(session.detections(), fresh):
+            return False, "snapshot %d differs from a fresh scan" % n
+    return True, "%d snapshots" % (n + 1)
+
+def check_tiled(image, templates, args):
+    whole = cs347.pyramid_find_objects_multi(image, templates, args.step, args.scale, nms=args.nms)
+    for tile in args.tiles:
+        tiled = cs347.tiled_find_objects_multi(image, templates, args.step, args.scale, tile, nms=args.nms)
+        if not same_objects(tiled, whole):
+            return False, "%d pixel tiles differ from the whole image" % tile
+    return True, "tiles of %s pixels" % ", ".join(str(tile) for tile in args.tiles)
+
+CHECKS = (
+    ("dense scores equal get_hog", check_dense),
+    ("session equals a fresh scan", check_session),
+    ("tiled equals a whole-image scan", check_tiled),
+)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check the dense, incremental and tiled detectors are exact.")
+    parser.add_argument("image", nargs="?", default="circuit1.png")
+    parser.add_argument("--step", type=int, default=16)
+    parser.add_argument("--scale", type=float, default=0.8)
+    parser.add_argument("--nms", type=float, default=None,
+                        help="suppress overlaps above this instead of the intersection merge")
+    parser.add_argument("--tiles", type=lambda text: [int(n) for n in text.split(",")], default=[128, 200],
+                        help="comma separated tile sizes for the tiled check")
+    parser.add_argument("--templates", default="components")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    image = io.imread(args.image, as_gray=True)
+    templates = cs347.load_templates(args.templates, orientations=("0", "90"))
+
+    failed = 0
+    for name, check in CHECKS:
+        passed, detail = check(image, templates, args)
+        print("%s: %s (%s)" % (name, "ok" if passed else "FAILED", detail))
+        failed += not passed
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
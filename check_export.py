@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+# Checks that StreamingFritzingDocument writes byte for byte what FritzingDocument
+# writes: for the Wheatstone bridge example as exported by default, unpruned and
+# routed, and for random netlists of increasing size. Prints a line per netlist and
+# exits with status 1 if any differ.
+#
+#   python3 check_export.py --sizes 10,100,1000
+
+import argparse
+import random
+import sys
+
+import ExportToFritzing_CS347 as fritzing
+
+def random_netlist(count, rng, board=fritzing.BREADBOARD):
+    # a power supply, count resistors and count wires between random pins of board
+    components = [{"type": "power", "title": "power", "pins": ["pin4Z", "pin3W"]}]
+    for n in range(count):
+        components.append({"type": "resistor", "title": "resistor_%d" % (n + 1),
+                           "pins": rng.sample(board.names, 2), "resistance": rng.choice([100, 200, 470, 1000])})
+    return {"components": components, "connections": [rng.sample(board.names, 2) for n in range(count)]}
+
+def netlists(args):
+    # (description, netlist, convert keyword arguments)
+    yield "wheatstone", fritzing.WHEATSTONE, {}
+    yield "wheatstone unpruned", fritzing.WHEATSTONE, {"prune": False}
+    yield "wheatstone routed", fritzing.WHEATSTONE, {"route": True}
+    rng = random.Random(args.seed)
+    for count in args.sizes:
+        yield "%d random parts" % count, random_netlist(count, rng), {"prune": False}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check the streaming .fz writer matches the tree writer.")
+    parser.add_argument("--sizes", type=lambda text: [int(n) for n in text.split(",")], default=[10, 100, 1000],
+                        help="comma separated resistor counts of the random netlists, each with as many wires")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    failed = 0
+    for description, netlist, options in netlists(args):
+        tree = fritzing.convert(netlist, streaming=False, **options)
+        streamed = fritzing.convert(netlist, streaming=True, **options)
+        same = tree == streamed
+        print("%s: %s (%d bytes)" % (description, "ok" if same else "FAILED", len(tree)))
+        failed += not same
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,149 +1,1447 @@
+import hashlib
+import json
 import math
-import matplotlib.patches as patches
-import matplotlib.pyplot as plt
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import numpy as np
-from skimage import filters, feature, data, color, exposure, io
-from skimage.feature import corner_peaks
-from skimage.filters import gaussian
-from skimage.transform import rescale, resize, downscale_local_mean
-from skimage.util.shape import view_as_blocks
-from scipy import signal
-from scipy.ndimage import interpolation
-from scipy.spatial.distance import cdist
-from scipy.ndimage.filters import convolve
+import scipy
+import skimage
+# skimage and scipy import their submodules on first use, so importing cs347 only
+# loads what a scan goes on to touch. The plot_* functions live in plot_cs347.
+from skimage import color, feature, transform, util
 
 def get_hog(image):
     return feature.hog(image, pixels_per_cell=(8, 8), block_norm='L1', visualize=True)
 
-def plot_hog(image, hog):
-    plt.subplot(1, 2, 1)
-    plt.imshow(image)
-    plt.axis('off')
+class DetectionStats(object):
+    """Opt-in timings and counters for a detection call.
 
-    plt.subplot(1, 2, 2)
-    plt.imshow(hog)
-    plt.axis('off')
+    Pass one as `stats` to the scan functions. Stage times are exclusive (a stage
+    nested in another is not counted twice) and cover "pyramid", "prefilter", "hog",
+    "histograms", "dot", "resize" and "merge". `levels` holds the scale, shape, windows
+    evaluated, windows rejected by the prefilter and wall time of every pyramid level, and
+    `bytes` the size of the arrays each stage allocated. The pyramid_* functions hand
+    the finished stats to `callback`, if given.
 
-    plt.show()
+    Windows are counted once per template they are scored against, and so are rejected
+    windows, so rejected / (windows + rejected) is the share of the work the prefilter
+    skipped.
+    """
 
-def sliding_window(image, base_score, stepSize, windowSize):
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.seconds = {}
+        self.calls = {}
+        self.bytes = {}
+        self.windows = 0
+        self.rejected = 0
+        self.levels = []
+        self._stack = []
+
+    def start(self, stage):
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def stop(self, nbytes=0):
+        stage, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed - nested
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if nbytes:
+            self.allocated(stage, nbytes)
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def allocated(self, stage, nbytes):
+        self.bytes[stage] = self.bytes.get(stage, 0) + nbytes
+
+    def count_windows(self, windows):
+        self.windows += windows
+
+    def count_rejected(self, windows):
+        self.rejected += windows
+
+    def merge(self, other):
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        for stage, calls in other.calls.items():
+            self.calls[stage] = self.calls.get(stage, 0) + calls
+        for stage, nbytes in other.bytes.items():
+            self.allocated(stage, nbytes)
+        self.windows += other.windows
+        self.rejected += other.rejected
+        self.levels.extend(other.levels)
+
+    def done(self):
+        if self.callback is not None:
+            self.callback(self)
+
+    def as_dict(self):
+        return {"seconds": dict(self.seconds), "calls": dict(self.calls), "bytes": dict(self.bytes),
+                "windows": self.windows, "rejected": self.rejected, "levels": list(self.levels)}
+
+class _NoStats(object):
+    # stands in for DetectionStats when stats are off, so the hot paths need no branches
+    windows = 0
+    rejected = 0
+
+    def start(self, stage):
+        pass
+
+    def stop(self, nbytes=0):
+        pass
+
+    def allocated(self, stage, nbytes):
+        pass
+
+    def count_windows(self, windows):
+        pass
+
+    def count_rejected(self, windows):
+        pass
+
+    def done(self):
+        pass
+
+NO_STATS = _NoStats()
+
+# Dense HOG: gradients and 8x8 cell histograms are computed once per image and every
+# window is scored by slicing the shared cell grid, instead of calling get_hog per window.
+# The numbers follow feature.hog (9 orientations, 3x3 cell blocks, L1 block norm),
+# including its zeroed gradients along the window border; cell sums are accumulated in
+# float64, so scores agree with get_hog to within its float32 cell accumulation.
+HOG_CELL = 8
+HOG_BLOCK = 3
+HOG_ORIENTATIONS = 9
+HOG_EPS = 1e-5
+
+def _float_dtype(dtype):
+    if dtype == np.float16 or dtype == np.float32:
+        return np.float32
+    return np.float64
+
+def _hog_gradients(image):
+    g_row = np.zeros(image.shape, dtype=image.dtype)
+    g_row[1:-1, :] = image[2:, :] - image[:-2, :]
+    g_col = np.zeros(image.shape, dtype=image.dtype)
+    g_col[:, 1:-1] = image[:, 2:] - image[:, :-2]
+    return g_row, g_col
+
+def _hog_orientation_bins(g_row, g_col):
+    magnitude = np.hypot(g_col, g_row)
+    orientation = np.rad2deg(np.arctan2(g_row, g_col)) % 180
+    edges = 180. / HOG_ORIENTATIONS * np.arange(HOG_ORIENTATIONS + 1)
+    bins = np.searchsorted(edges, orientation, side='right') - 1
+    # orientation can round up to exactly 180, which feature.hog puts in no bin
+    outside = bins >= HOG_ORIENTATIONS
+    magnitude[outside] = 0
+    bins[outside] = 0
+    return magnitude, bins.astype(np.uint8)
+
+def _window_origins(length, stepSize):
+    return np.arange(0, length, stepSize)
+
+class HogGrid(object):
+    """Gradients and cell histograms of one image, shared by all windows scanned on it.
+
+    The image is edge padded once for the largest of `windowSizes`, the same way
+    find_objects pads it, so windows of several shapes can be scored on one grid.
+    Gradients are kept in the image's float type, so a float32 image roughly halves
+    the grid's memory at the cost of float32 rounding in the scores.
+
+    With box = (top, bottom, left, right) the grid covers only that part of image and
+    indexes windows as if it were the whole image, but pads it from the surrounding
+    pixels where there are any, so its windows score the same as in a grid of the
+    whole image. Only the box is read, which suits memory-mapped images.
+
+    Cell histograms are computed per window phase and, unless keepHistograms (which
+    update() needs), dropped again once that phase is scored, so a grid holds at most
+    one phase's histograms on top of its gradients. Such a grid also computes only the
+    cells the windows being scored cover, so scoring a few windows (those a prefilter
+    keeps, or coarse_to_fine's refinements) skips most of the histogram work.
+    """
+
+    def __init__(self, image, windowSizes, stats=NO_STATS, box=None, keepHistograms=False):
+        stats.start("hog")
+        self.stats = stats
+        image = np.asarray(image)
+        H, W = image.shape
+        r0, r1, c0, c1 = (0, H, 0, W) if box is None else box
+        self.shape = (r1 - r0, c1 - c0)
+        top = max(winH // 2 for winH, winW in windowSizes)
+        bottom = max(winH - winH // 2 for winH, winW in windowSizes)
+        left = max(winW // 2 for winH, winW in windowSizes)
+        right = max(winW - winW // 2 for winH, winW in windowSizes)
+        self.pad = (top, bottom, left, right)
+        a0, a1 = max(r0 - top, 0), min(r1 + bottom, H)
+        b0, b1 = max(c0 - left, 0), min(c1 + right, W)
+        image = np.asarray(image[a0:a1, b0:b1])
+        image = image.astype(_float_dtype(image.dtype), copy=False)
+        pad_image = np.pad(image, ((a0 - (r0 - top), r1 + bottom - a1), (b0 - (c0 - left), c1 + right - b1)),
+                           mode='edge')
+        self.g_row, self.g_col = _hog_gradients(pad_image)
+        del pad_image
+        # binned a band of rows at a time to keep the float64 temporaries small
+        self.magnitude = np.empty(self.g_row.shape, dtype=self.g_row.dtype)
+        self.bins = np.empty(self.g_row.shape, dtype=np.uint8)
+        for start in range(0, self.g_row.shape[0], 32 * HOG_CELL):
+            band = slice(start, start + 32 * HOG_CELL)
+            self.magnitude[band], self.bins[band] = _hog_orientation_bins(self.g_row[band], self.g_col[band])
+        self._histograms = {}
+        self.keepHistograms = keepHistograms
+        stats.stop(self.g_row.nbytes + self.g_col.nbytes + self.magnitude.nbytes + self.bins.nbytes)
+
+    def cell_histograms(self, pr, pc, rowmode=None, colmode=None, spans=None):
+        """Cell histograms of the grid starting at padded pixel (pr, pc).
+
+        `rowmode` is 'top' or 'bottom' and `colmode` is 'left' or 'right' for cells on
+        that border of a window, where feature.hog zeroes the gradient across the border.
+        With `spans`, the [first, end) cell columns of each cell row as _cell_spans
+        returns them, only those cells are computed and the others are left zero.
+        """
+        key = (pr, pc, rowmode, colmode)
+        if key in self._histograms:
+            return self._histograms[key]
+
+        self.stats.start("histograms")
+        nR = (self.g_row.shape[0] - pr) // HOG_CELL
+        nC = (self.g_row.shape[1] - pc) // HOG_CELL
+        histogram = self._cell_histograms(pr, pc, rowmode, colmode, 0, nR, 0, nC, spans)
+        self._histograms[key] = histogram
+        self.stats.stop(histogram.nbytes)
+        return histogram
+
+    def _release(self, pr, pc):
+        # drop the cached histograms of phase (pr, pc) once it is scored
+        if not self.keepHistograms:
+            for key in [key for key in self._histograms if key[:2] == (pr, pc)]:
+                del self._histograms[key]
+
+    def _cell_spans(self, pr, pc, cellRows, cellCols, nCellsR, nCellsC):
+        # [first, end) cell columns per cell row covered by the windows at (cellRows[n], cellCols[n])
+        nR = (self.g_row.shape[0] - pr) // HOG_CELL
+        nC = (self.g_row.shape[1] - pc) // HOG_CELL
+        spans = np.zeros((nR, 2), dtype=int)
+        spans[:, 0] = nC
+        rows = (cellRows[:, None] + np.arange(nCellsR)).ravel()
+        np.minimum.at(spans[:, 0], rows, np.repeat(cellCols, nCellsR))
+        np.maximum.at(spans[:, 1], rows, np.repeat(cellCols + nCellsC, nCellsR))
+        return spans
+
+    def _cell_histograms(self, pr, pc, rowmode, colmode, r0, r1, c0, c1, spans=None):
+        # histograms of cells r0:r1 x c0:c1 of the grid starting at padded pixel (pr, pc),
+        # or of cells spans[r][0]:spans[r][1] of each row r
+        nC = c1 - c0
+        border = np.zeros((HOG_CELL, nC * HOG_CELL), dtype=bool)
+        if rowmode == 'top':
+            border[0, :] = True
+        elif rowmode == 'bottom':
+            border[HOG_CELL - 1, :] = True
+        if colmode == 'left':
+            border[:, 0::HOG_CELL] = True
+        elif colmode == 'right':
+            border[:, HOG_CELL - 1::HOG_CELL] = True
+        borderRows, borderCols = np.nonzero(border)
+        zeroRow = borderRows == (0 if rowmode == 'top' else HOG_CELL - 1)
+        zeroCol = borderCols % HOG_CELL == (0 if colmode == 'left' else HOG_CELL - 1)
+        index = (np.arange(nC * HOG_CELL) // HOG_CELL) * HOG_ORIENTATIONS
+
+        # one row of cells at a time, so only a band of HOG_CELL pixel rows is ever copied
+        histogram = np.zeros((r1 - r0, nC * HOG_ORIENTATIONS), dtype=self.magnitude.dtype)
+        for r in range(r0, r1):
+            a, b = (c0, c1) if spans is None else spans[r]
+            if a >= b:
+                continue
+            width = (b - a) * HOG_CELL
+            band = (slice(pr + r * HOG_CELL, pr + (r + 1) * HOG_CELL),
+                    slice(pc + a * HOG_CELL, pc + b * HOG_CELL))
+            magnitude = self.magnitude[band]
+            bins = self.bins[band]
+            if rowmode is not None or colmode is not None:
+                # the border pattern repeats every cell, so the first width columns of it fit
+                inside = borderCols < width
+                g_row = self.g_row[band][border[:, :width]]
+                g_col = self.g_col[band][border[:, :width]]
+                if rowmode is not None:
+                    g_row[zeroRow[inside]] = 0
+                if colmode is not None:
+                    g_col[zeroCol[inside]] = 0
+                magnitude = magnitude.copy()
+                bins = bins.copy()
+                magnitude[border[:, :width]], bins[border[:, :width]] = _hog_orientation_bins(g_row, g_col)
+            histogram[r - r0, (a - c0) * HOG_ORIENTATIONS:(b - c0) * HOG_ORIENTATIONS] = np.bincount(
+                (index[:width] + bins).ravel(), weights=magnitude.ravel(), minlength=(b - a) * HOG_ORIENTATIONS)
+        histogram /= HOG_CELL * HOG_CELL
+        return histogram.reshape(r1 - r0, nC, HOG_ORIENTATIONS)
+
+    def update(self, image, box):
+        """Recompute the grid after `image` changed inside box = (top, bottom, left, right).
+
+        Only the gradients and the cached cell histograms that can see the box are
+        redone. Returns the padded (top, bottom, left, right) range whose gradients may
+        have changed, for finding the windows to rescore.
+        """
+        self.stats.start("hog")
+        H, W = self.shape
+        top, bottom, left, right = self.pad
+        PH, PW = self.g_row.shape
+        r0, r1, c0, c1 = box
+        # padded pixels copied from the box (edge padding repeats the border), and their
+        # central differences one pixel further out
+        p0 = max((0 if r0 == 0 else r0 + top) - 1, 0)
+        p1 = min((PH if r1 == H else r1 + top) + 1, PH)
+        q0 = max((0 if c0 == 0 else c0 + left) - 1, 0)
+        q1 = min((PW if c1 == W else c1 + left) + 1, PW)
+        rows = np.clip(np.arange(p0 - 1, p1 + 1) - top, 0, H - 1)
+        cols = np.clip(np.arange(q0 - 1, q1 + 1) - left, 0, W - 1)
+        crop = np.asarray(image)[np.ix_(rows, cols)].astype(self.g_row.dtype, copy=False)
+        g_row, g_col = _hog_gradients(crop)
+        g_row, g_col = g_row[1:-1, 1:-1], g_col[1:-1, 1:-1]
+        # the grid's own border rows and columns have no gradient
+        if p0 == 0:
+            g_row[0] = 0
+        if p1 == PH:
+            g_row[-1] = 0
+        if q0 == 0:
+            g_col[:, 0] = 0
+        if q1 == PW:
+            g_col[:, -1] = 0
+        self.g_row[p0:p1, q0:q1] = g_row
+        self.g_col[p0:p1, q0:q1] = g_col
+        self.magnitude[p0:p1, q0:q1], self.bins[p0:p1, q0:q1] = _hog_orientation_bins(g_row, g_col)
+        self.stats.stop()
+
+        self.stats.start("histograms")
+        for (pr, pc, rowmode, colmode), histogram in self._histograms.items():
+            nR, nC = histogram.shape[:2]
+            cr0, cr1 = max((p0 - pr) // HOG_CELL, 0), min(-(-(p1 - pr) // HOG_CELL), nR)
+            cc0, cc1 = max((q0 - pc) // HOG_CELL, 0), min(-(-(q1 - pc) // HOG_CELL), nC)
+            if cr0 < cr1 and cc0 < cc1:
+                histogram[cr0:cr1, cc0:cc1] = self._cell_histograms(pr, pc, rowmode, colmode, cr0, cr1, cc0, cc1)
+        self.stats.stop()
+        return (p0, p1, q0, q1)
+
+    def windows_touching(self, windowSize, stepSize, box):
+        # grid index ranges (i0, i1, j0, j1) of the windows overlapping a padded box
+        winH, winW = windowSize
+        H, W = self.shape
+        p0, p1, q0, q1 = box
+        baseR = self.pad[0] - winH // 2
+        baseC = self.pad[2] - winW // 2
+        i0 = max((p0 - baseR - winH) // stepSize + 1, 0)
+        i1 = min(-(-(p1 - baseR) // stepSize), (H - 1) // stepSize + 1)
+        j0 = max((q0 - baseC - winW) // stepSize + 1, 0)
+        j1 = min(-(-(q1 - baseC) // stepSize), (W - 1) // stepSize + 1)
+        return i0, i1, j0, j1
+
+    def _block_weights(self, weights, windowSize):
+        winH, winW = windowSize
+        weights = np.atleast_2d(weights)
+        nCellsR, nCellsC = winH // HOG_CELL, winW // HOG_CELL
+        nBlocksR, nBlocksC = nCellsR - HOG_BLOCK + 1, nCellsC - HOG_BLOCK + 1
+        if nBlocksR <= 0 or nBlocksC <= 0:
+            raise ValueError("window %s is smaller than one HOG block" % (windowSize,))
+        descriptor = (nBlocksR, nBlocksC, HOG_BLOCK, HOG_BLOCK, HOG_ORIENTATIONS)
+        if weights.shape[1] != np.prod(descriptor):
+            raise ValueError("descriptor of length %d does not fit window %s"
+                             % (weights.shape[1], windowSize))
+        return np.moveaxis(weights.reshape((len(weights),) + descriptor), 0, -1), nCellsR, nCellsC
+
+    def scores(self, weights, windowSize, stepSize, keep=None):
+        """Dot products of every window's HOG with each row of `weights`.
+
+        Returns an array of shape (H // stepSize + 1, W // stepSize + 1, K) laid out
+        like find_objects' response_map, with zeros where no window starts. With a
+        boolean `keep` grid from content_mask, only the kept windows are scored, and
+        unless the grid keeps its histograms only the cells they cover are computed.
+        """
+        winH, winW = windowSize
+        H, W = self.shape
+        if keep is not None:
+            I, J = np.nonzero(keep)
+            scores = self.window_scores(weights, windowSize, stepSize, I, J)
+            response_map = np.zeros((H // stepSize + 1, W // stepSize + 1, scores.shape[-1]))
+            response_map[I, J] = scores
+            return response_map
+        weights, nCellsR, nCellsC = self._block_weights(weights, windowSize)
+
+        self.stats.start("dot")
+        response_map = np.zeros((H // stepSize + 1, W // stepSize + 1, weights.shape[-1]))
+        rowOrigins = self.pad[0] - winH // 2 + _window_origins(H, stepSize)
+        colOrigins = self.pad[2] - winW // 2 + _window_origins(W, stepSize)
+        for pr in np.unique(rowOrigins % HOG_CELL):
+            I = np.nonzero(rowOrigins % HOG_CELL == pr)[0]
+            for pc in np.unique(colOrigins % HOG_CELL):
+                J = np.nonzero(colOrigins % HOG_CELL == pc)[0]
+                cellRows = (rowOrigins[I] - pr) // HOG_CELL
+                cellCols = (colOrigins[J] - pc) // HOG_CELL
+                response_map[np.ix_(I, J)] = self._phase_scores(
+                    pr, pc, cellRows, cellCols, weights, nCellsR, nCellsC,
+                    winH % HOG_CELL == 0, winW % HOG_CELL == 0)
+                self._release(pr, pc)
+        self.stats.stop(response_map.nbytes)
+        self.stats.count_windows(len(rowOrigins) * len(colOrigins) * weights.shape[-1])
+        return response_map
+
+    def window_scores(self, weights, windowSize, stepSize, I, J):
+        """Like scores, but only for the windows at grid indices (I[n], J[n]); shape (N, K)."""
+        winH, winW = windowSize
+        weights, nCellsR, nCellsC = self._block_weights(weights, windowSize)
+        I = np.asarray(I, dtype=int)
+        J = np.asarray(J, dtype=int)
+        self.stats.start("dot")
+        result = np.zeros((len(I), weights.shape[-1]))
+        rowOrigins = self.pad[0] - winH // 2 + I * stepSize
+        colOrigins = self.pad[2] - winW // 2 + J * stepSize
+        phases = (rowOrigins % HOG_CELL) * HOG_CELL + colOrigins % HOG_CELL
+        for phase in np.unique(phases):
+            pr, pc = divmod(int(phase), HOG_CELL)
+            N = np.nonzero(phases == phase)[0]
+            cellRows = (rowOrigins[N] - pr) // HOG_CELL
+            cellCols = (colOrigins[N] - pc) // HOG_CELL
+            # kept histograms must be whole for later windows, see update()
+            spans = None
+            if not self.keepHistograms:
+                spans = self._cell_spans(pr, pc, cellRows, cellCols, nCellsR, nCellsC)
+            result[N] = self._phase_scores(
+                pr, pc, cellRows, cellCols, weights, nCellsR, nCellsC,
+                winH % HOG_CELL == 0, winW % HOG_CELL == 0, paired=True, spans=spans)
+            self._release(pr, pc)
+        self.stats.stop(result.nbytes)
+        self.stats.count_windows(len(I) * weights.shape[-1])
+        return result
+
+    def _phase_scores(self, pr, pc, cellRows, cellCols, weights, nCellsR, nCellsC, bottom, right, paired=False,
+                      spans=None):
+        # cellRows x cellCols windows, or the windows (cellRows[n], cellCols[n]) if paired
+        nBlocksR, nBlocksC = weights.shape[:2]
+        shape = (len(cellRows),) if paired else (len(cellRows), len(cellCols))
+        total = np.zeros(shape + (weights.shape[-1],))
+        for p in range(nBlocksR):
+            for q in range(nBlocksC):
+                norm = np.zeros(shape + (1,))
+                dot = np.zeros(total.shape)
+                for u in range(HOG_BLOCK):
+                    rowmode = None
+                    if p + u == 0:
+                        rowmode = 'top'
+                    elif bottom and p + u == nCellsR - 1:
+                        rowmode = 'bottom'
+                    for v in range(HOG_BLOCK):
+                        colmode = None
+                        if q + v == 0:
+                            colmode = 'left'
+                        elif right and q + v == nCellsC - 1:
+                            colmode = 'right'
+                        histogram = self.cell_histograms(pr, pc, rowmode, colmode, spans)
+                        if paired:
+                            cells = histogram[cellRows + p + u, cellCols + q + v]
+                        else:
+                            cells = histogram[np.ix_(cellRows + p + u, cellCols + q + v)]
+                        norm += cells.sum(axis=-1, keepdims=True)
+                        dot += cells.dot(weights[p, q, u, v])
+                total += dot / (norm + HOG_EPS)
+        return total
+
+# Windows are only worth a HOG if they hold some ink and some gradient. min_ink is the
+# mean darkness (1 - intensity on a [0, 1] scale) a window needs, and a window is kept
+# only when its mean gradient magnitude is above min_gradient. A window with no gradient
+# at all has an all-zero descriptor and scores exactly 0, so Prefilter(0, 0) loses nothing.
+Prefilter = namedtuple("Prefilter", "min_ink min_gradient")
+
+def _integral(values):
+    total = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(values, axis=0, out=total[1:, 1:])
+    np.cumsum(total[1:, 1:], axis=1, out=total[1:, 1:])
+    return total
+
+def _box_means(total, rows, cols, h, w):
+    r = rows[:, None]
+    c = cols[None, :]
+    return (total[r + h, c + w] - total[r, c + w] - total[r + h, c] + total[r, c]) / float(h * w)
+
+def content_mask(image, windowSize, stepSize, prefilter, stats=NO_STATS, box=None):
+    """Which windows pass prefilter, as a (rows, cols) boolean grid of window origins.
+
+    Ink and gradient magnitude are summed into integral images once for the padded
+    image, so each window costs four lookups per measure instead of a HOG. Callers
+    count the rejected windows, once per template they would have been scored against.
+    With box = (top, bottom, left, right) only the windows starting in the box are
+    tested, reading the box and its surroundings as HogGrid does.
+    """
+    stats.start("prefilter")
+    winH, winW = windowSize
+    H, W = image.shape
+    r0, r1, c0, c1 = (0, H, 0, W) if box is None else box
+    # one pixel more than the window padding, for the central differences at its edge
+    top, bottom = winH // 2 + 1, winH - winH // 2 + 1
+    left, right = winW // 2 + 1, winW - winW // 2 + 1
+    a0, a1 = max(r0 - top, 0), min(r1 + bottom, H)
+    b0, b1 = max(c0 - left, 0), min(c1 + right, W)
+    pad_image = np.pad(util.img_as_float(np.asarray(image[a0:a1, b0:b1])),
+                       ((a0 - (r0 - top), r1 + bottom - a1), (b0 - (c0 - left), c1 + right - b1)), mode='edge')
+    g_row, g_col = _hog_gradients(pad_image)
+    pad_image, g_row, g_col = pad_image[1:-1, 1:-1], g_row[1:-1, 1:-1], g_col[1:-1, 1:-1]
+    rows = _window_origins(r1 - r0, stepSize)
+    cols = _window_origins(c1 - c0, stepSize)
+    keep = np.ones((len(rows), len(cols)), dtype=bool)
+    if prefilter.min_ink > 0:
+        ink = _box_means(_integral(1 - pad_image), rows, cols, winH, winW)
+        keep &= ink >= prefilter.min_ink
+    magnitude = np.hypot(g_row, g_col)
+    energy = _box_means(_integral(magnitude), rows, cols, winH, winW)
+    # rounding in the integral image leaves blank windows a tiny energy that depends on
+    # where the image starts; counting the pixels with any gradient is exact
+    edges = _box_means(_integral(magnitude > 0), rows, cols, winH, winW)
+    keep &= (energy > prefilter.min_gradient) & (edges > 0)
+    stats.stop()
+    return keep
+
+def dense_response_map(image, base_score, stepSize, windowSize, grid=None, stats=NO_STATS, keep=None):
+    if grid is None:
+        grid = HogGrid(image, [windowSize], stats)
+    return grid.scores(base_score, windowSize, stepSize, keep)[..., 0]
+
+def sliding_window(image, base_score, stepSize, windowSize, dense=False, stats=NO_STATS, prefilter=None):
     (max_score, maxr, maxc) = (0, 0, 0)
     winH, winW = windowSize
     H, W = image.shape
-    pad_image = np.lib.pad(image, ((winH // 2, winH - winH // 2), (winW // 2, winW - winW // 2)), mode='edge')
+    keep = None
+    if prefilter is not None:
+        keep = content_mask(image, windowSize, stepSize, prefilter, stats)
+        stats.count_rejected(int(keep.size - np.count_nonzero(keep)))
+
+    if dense:
+        response_map = dense_response_map(image, base_score, stepSize, windowSize, stats=stats, keep=keep)
+        k = np.argmax(response_map)
+        if response_map.flat[k] > max_score:
+            i, j = [int(n) for n in np.unravel_index(k, response_map.shape)]
+            max_score = response_map[i][j]
+            maxr = i * stepSize - winH // 2
+            maxc = j * stepSize - winW // 2
+        stats.start("resize")
+        response_map = transform.resize(response_map, image.shape, mode="edge")
+        stats.stop(response_map.nbytes)
+        return (max_score, maxr, maxc, response_map)
+
+    pad_image = np.pad(image, ((winH // 2, winH - winH // 2), (winW // 2, winW - winW // 2)), mode='edge')
     response_map = np.zeros((H // stepSize + 1, W // stepSize + 1))
 
     for i in range(H // stepSize + 1):
         for j in range(W // stepSize + 1):
             if i * stepSize >= H or j * stepSize >= W:
                 continue
+            if keep is not None and not keep[i][j]:
+                continue
+            stats.start("hog")
             image_feature, image_hog = get_hog(pad_image[i * stepSize : i * stepSize + winH, j * stepSize : j * stepSize + winW])
+            stats.stop()
+            stats.start("dot")
             response_map[i][j] = np.dot(image_feature, base_score)
+            stats.stop()
             if response_map[i][j] > max_score:
                 max_score = response_map[i][j]
                 maxr = i * stepSize - winH // 2
                 maxc = j * stepSize - winW // 2
-    response_map = resize(response_map, image.shape, mode="edge")
+    stats.count_windows(((H - 1) // stepSize + 1) * ((W - 1) // stepSize + 1) if keep is None else np.count_nonzero(keep))
+    stats.start("resize")
+    response_map = transform.resize(response_map, image.shape, mode="edge")
+    stats.stop(response_map.nbytes)
 
     return (max_score, maxr, maxc, response_map)
 
-def find_objects(image, threshold_score, base_score, stepSize, windowSize):
+def find_objects(image, threshold_score, base_score, stepSize, windowSize, dense=False, stats=NO_STATS,
+                 prefilter=None):
     max_score = []
     maxr = []
     maxc = []
     winH, winW = windowSize
     H, W = image.shape
-    pad_image = np.lib.pad(image, ((winH // 2, winH - winH // 2), (winW // 2, winW - winW // 2)), mode='edge')
+    keep = None
+    if prefilter is not None:
+        keep = content_mask(image, windowSize, stepSize, prefilter, stats)
+        stats.count_rejected(int(keep.size - np.count_nonzero(keep)))
+
+    if dense:
+        response_map = dense_response_map(image, base_score, stepSize, windowSize, stats=stats, keep=keep)
+        return threshold_response_map(response_map, image.shape, threshold_score, stepSize, windowSize)
+
+    pad_image = np.pad(image, ((winH // 2, winH - winH // 2), (winW // 2, winW - winW // 2)), mode='edge')
     response_map = np.zeros((H // stepSize + 1, W // stepSize + 1))
 
     for i in range(H // stepSize + 1):
         for j in range(W // stepSize + 1):
             if i * stepSize >= H or j * stepSize >= W:
                 continue
+            if keep is not None and not keep[i][j]:
+                continue
+            stats.start("hog")
             image_feature, image_hog = get_hog(pad_image[i * stepSize : i * stepSize + winH, j * stepSize : j * stepSize + winW])
+            stats.stop()
+            stats.start("dot")
             response_map[i][j] = np.dot(image_feature, base_score)
+            stats.stop()
             if response_map[i][j] > threshold_score:
                 maxr.append(i * stepSize - winH // 2)
                 maxc.append(j * stepSize - winW // 2)
                 max_score.append(response_map[i][j])
-    response_map = resize(response_map, image.shape, mode="edge")
+    stats.count_windows(((H - 1) // stepSize + 1) * ((W - 1) // stepSize + 1) if keep is None else np.count_nonzero(keep))
+    stats.start("resize")
+    response_map = transform.resize(response_map, image.shape, mode="edge")
+    stats.stop(response_map.nbytes)
 
     return (max_score, maxr, maxc)
 
-def plot_prediction(image, r, c, winW, winH):
-    fig, ax = plt.subplots(1)
-    ax.imshow(image)
-    rect = patches.Rectangle((c, r), winW, winH, linewidth=1, edgecolor='r', facecolor='none')
-    ax.add_patch(rect)
-    plt.show()
+def threshold_response_map(response_map, imageShape, threshold_score, stepSize, windowSize):
+    max_score = []
+    maxr = []
+    maxc = []
+    winH, winW = windowSize
+    H, W = imageShape
+    valid = response_map[:(H - 1) // stepSize + 1, :(W - 1) // stepSize + 1]
+    for i, j in zip(*np.nonzero(valid > threshold_score)):
+        maxr.append(int(i) * stepSize - winH // 2)
+        maxc.append(int(j) * stepSize - winW // 2)
+        max_score.append(response_map[i][j])
+    return (max_score, maxr, maxc)
 
-def plot_heatmap(response_map):
-    plt.imshow(response_map, cmap='viridis', interpolation='nearest')
-    plt.title('sliding window')
-    plt.show()
+def score_windows(image, base_score, stepSize, windowSize, windows=None, dense=False, stats=NO_STATS,
+                  prefilter=None):
+    # Scores of the windows at grid indices windows = (I, J), or of every window if None.
+    # Returns (I, J, scores) as arrays; windows rejected by prefilter are left out.
+    winH, winW = windowSize
+    H, W = image.shape
+    if windows is None:
+        I, J = np.indices(((H - 1) // stepSize + 1, (W - 1) // stepSize + 1)).reshape(2, -1)
+    else:
+        I, J = [np.asarray(n, dtype=int) for n in windows]
+    if prefilter is not None:
+        keep = content_mask(image, windowSize, stepSize, prefilter, stats)[I, J]
+        stats.count_rejected(int(len(keep) - np.count_nonzero(keep)))
+        I, J = I[keep], J[keep]
+        windows = (I, J)
 
-def pyramid(image, scale=0.9, minSize=(200, 100)):
-    images = []
+    if dense:
+        grid = HogGrid(image, [windowSize], stats)
+        if windows is None:
+            scores = grid.scores(base_score, windowSize, stepSize)[I, J, 0]
+        else:
+            scores = grid.window_scores(base_score, windowSize, stepSize, I, J)[:, 0]
+        return I, J, scores
+
+    pad_image = np.pad(image, ((winH // 2, winH - winH // 2), (winW // 2, winW - winW // 2)), mode='edge')
+    scores = np.zeros(len(I))
+    for n in range(len(I)):
+        i, j = I[n], J[n]
+        stats.start("hog")
+        image_feature, image_hog = get_hog(pad_image[i * stepSize : i * stepSize + winH, j * stepSize : j * stepSize + winW])
+        stats.stop()
+        stats.start("dot")
+        scores[n] = np.dot(image_feature, base_score)
+        stats.stop()
+    stats.count_windows(len(I))
+    return I, J, scores
+
+# A named template descriptor; shape is the (winH, winW) window it was computed on.
+# orientation names the variant of the template image the descriptor was taken from,
+# see ORIENTATIONS; templates of other orientations are named "<component>@<orientation>"
+Template = namedtuple("Template", "name base_score shape threshold orientation", defaults=("0",))
+
+# angle the template image is rotated counter-clockwise by, after mirroring it left to
+# right for the "m" variants
+ORIENTATIONS = ("0", "90", "180", "270", "0m", "90m", "180m", "270m")
+
+# rescale factor and detection threshold of each components/<name>.png, as tuned in the notebook
+COMPONENTS = {
+    "resistor": (1.0, 4),
+    "voltagesource": (0.6, 8),
+    "wire": (0.5, 1.5),
+}
+
+def make_template(name, image, threshold, orientation="0"):
+    image = orient(image, orientation)
+    base_score, hog = get_hog(image)
+    return Template(template_name(name, orientation), base_score, image.shape, threshold, orientation)
+
+def orient(image, orientation):
+    if orientation not in ORIENTATIONS:
+        raise ValueError("orientation must be one of %s, not %r" % (", ".join(ORIENTATIONS), orientation))
+    if orientation.endswith("m"):
+        image = image[:, ::-1]
+    return np.ascontiguousarray(np.rot90(image, int(orientation.rstrip("m")) // 90))
+
+def template_name(component, orientation):
+    return component if orientation == "0" else "%s@%s" % (component, orientation)
+
+def component_name(template):
+    return template.name.partition("@")[0]
+
+def read_template_image(path, factor):
+    image = skimage.io.imread(path, as_gray=True)
+    if factor != 1.0:
+        image = transform.rescale(image, factor)
+    return image
+
+def template_key(data, factor):
+    # Identifies a descriptor by the template file's bytes, its rescale factor and
+    # everything that shapes the HOG, so changing any of them misses the cache.
+    digest = hashlib.sha1(data)
+    digest.update(repr((float(factor), HOG_CELL, HOG_BLOCK, HOG_ORIENTATIONS, 'L1',
+                        skimage.__version__)).encode("utf-8"))
+    return digest.hexdigest()
+
+def _replace_file(path, write):
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+def cached_template(name, path, factor, threshold, cache, orientation="0"):
+    """Template for the image at path, with its descriptor stored under the cache directory.
+
+    Descriptors are kept as <name>-<key>.npy next to a <name>-<key>.json holding the
+    window shape, and are memory mapped read-only when the key still matches, so worker
+    processes share one copy instead of recomputing it.
+    """
+    with open(path, "rb") as f:
+        key = template_key(f.read(), factor)
+    entry_name = template_name(name, orientation)
+    stem = os.path.join(cache, "%s-%s" % (entry_name, key))
+    try:
+        with open(stem + ".json") as f:
+            shape = tuple(json.load(f)["shape"])
+        return Template(entry_name, np.load(stem + ".npy", mmap_mode="r"), shape, threshold, orientation)
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+
+    template = make_template(name, read_template_image(path, factor), threshold, orientation)
+    # pool workers start together and may all be writing the same entries
+    os.makedirs(cache, exist_ok=True)
+    entry = re.compile(re.escape(entry_name) + r"-[0-9a-f]{40}\.(npy|json)$")
+    for stale in os.listdir(cache):
+        if entry.match(stale) and not stale.startswith(key, len(entry_name) + 1):
+            try:
+                os.remove(os.path.join(cache, stale))
+            except FileNotFoundError:
+                pass
+    _replace_file(stem + ".npy", lambda f: np.save(f, template.base_score))
+    _replace_file(stem + ".json", lambda f: f.write(json.dumps({"shape": list(template.shape)}).encode("utf-8")))
+    return template
+
+def load_templates(directory="components", components=COMPONENTS, cache=None, orientations=("0",)):
+    # cache is a directory for cached_template; None computes every descriptor afresh.
+    # One template per component and orientation: the 0/180 variants and their mirrors
+    # share a window shape, as do the 90/270 ones, so find_objects_multi scores each set
+    # in one batched product over the same cell histograms.
+    templates = []
+    for name, (factor, threshold) in components.items():
+        path = os.path.join(directory, name + ".png")
+        image = None
+        for orientation in orientations:
+            if cache is not None:
+                templates.append(cached_template(name, path, factor, threshold, cache, orientation))
+                continue
+            if image is None:
+                image = read_template_image(path, factor)
+            templates.append(make_template(name, image, threshold, orientation))
+    return templates
+
+def group_templates(templates):
+    groups = {}
+    for template in templates:
+        groups.setdefault(tuple(template.shape), []).append(template)
+    return groups
+
+def find_objects_multi(image, templates, stepSize, grid=None, stats=NO_STATS, prefilter=None):
+    # Templates sharing a window shape are scored together as rows of one weight matrix
+    # against a single HogGrid, so each extra template is one more row, not another scan.
+    if grid is None:
+        grid = HogGrid(image, [template.shape for template in templates], stats)
+    found = {}
+    for shape, group in group_templates(templates).items():
+        weights = np.array([template.base_score for template in group])
+        keep = None
+        if prefilter is not None:
+            keep = content_mask(image, shape, stepSize, prefilter, stats)
+            stats.count_rejected(int(keep.size - np.count_nonzero(keep)) * len(group))
+        response_maps = grid.scores(weights, shape, stepSize, keep)
+        for k, template in enumerate(group):
+            found[template.name] = threshold_response_map(
+                response_maps[..., k], image.shape, template.threshold, stepSize, shape)
+    return found
+
+def iter_pyramid(image, scale=0.9, minSize=(200, 100), dtype=None, stats=NO_STATS):
+    # Yields the same (scale, level) pairs as pyramid, one level at a time, so a consumer
+    # that drops each level holds roughly one level in memory. dtype (e.g. np.float32)
+    # sets the working float type of every level.
+    if dtype is not None:
+        image = util.img_as_float(image).astype(dtype, copy=False)
     current_scale = 1.0
-    images.append((current_scale, image))
+    yield (current_scale, image)
     while True:
         if image.shape[0] * scale < minSize[0] or image.shape[1] * scale < minSize[1]:
             break
         current_scale *= scale
-        image = rescale(image, scale)
-        images.append((current_scale, image))
-    return images
+        stats.start("pyramid")
+        image = transform.rescale(image, scale)
+        if dtype is not None:
+            image = image.astype(dtype, copy=False)
+        stats.stop(image.nbytes)
+        yield (current_scale, image)
+
+def pyramid(image, scale=0.9, minSize=(200, 100)):
+    return list(iter_pyramid(image, scale, minSize))
+
+def _scan_level(function, level):
+    stats = DetectionStats()
+    start = time.perf_counter()
+    result = function(level, stats=stats)
+    stats.levels.append({"shape": list(level.shape), "windows": stats.windows, "rejected": stats.rejected,
+                         "seconds": time.perf_counter() - start})
+    return result, stats
 
-def pyramid_score(image, base_score, shape, stepSize=20, scale=0.9):
+def map_levels(function, images, executor=None, workers=None, stats=NO_STATS):
+    # Yields (scale, function(level)) for every (scale, level) pair, in pyramid order.
+    # executor is None (serial), "process", "thread" or an Executor the caller manages.
+    # The serial path pulls one level at a time from images. With stats, function gets
+    # a fresh DetectionStats per level, wherever it runs, merged back here in order.
+    if stats is not NO_STATS:
+        for current_scale, (result, level_stats) in map_levels(partial(_scan_level, function), images,
+                                                                executor, workers):
+            level_stats.levels[-1]["scale"] = current_scale
+            stats.merge(level_stats)
+            yield current_scale, result
+        return
+    if executor is None:
+        for current_scale, level in images:
+            yield current_scale, function(level)
+        return
+    if isinstance(executor, Executor):
+        futures = [(current_scale, executor.submit(function, level)) for current_scale, level in images]
+        for current_scale, future in futures:
+            yield current_scale, future.result()
+        return
+    with make_executor(executor, workers) as pool:
+        for current_scale, result in map_levels(function, images, pool):
+            yield current_scale, result
+
+def make_executor(executor, workers=None):
+    # A new pool for executor = "process" or "thread", for callers that run map_levels
+    # several times on one pool and shut it down themselves.
+    if executor == "process":
+        return ProcessPoolExecutor(workers)
+    if executor == "thread":
+        return ThreadPoolExecutor(workers)
+    raise ValueError("executor must be None, 'process', 'thread' or an Executor, not %r" % (executor,))
+
+def pyramid_score(image, base_score, shape, stepSize=20, scale=0.9, dense=False, executor=None, workers=None,
+                  dtype=None, stats=NO_STATS, prefilter=None):
     max_score = 0
     maxr = 0
     maxc = 0
     max_scale = 1.0
-    max_response_map = np.zeros(image.shape)
-    images = pyramid(image, scale)
-    for i in images:
-        ms, mr, mc, mrm = sliding_window(i[1], base_score, stepSize, shape)
+    max_response_map = None
+    images = iter_pyramid(image, scale, dtype=dtype, stats=stats)
+    scan = partial(sliding_window, base_score=base_score, stepSize=stepSize, windowSize=shape, dense=dense,
+                   prefilter=prefilter)
+    for current_scale, (ms, mr, mc, mrm) in map_levels(scan, images, executor, workers, stats):
         if ms > max_score:
             max_score = ms
             maxr = mr
             maxc = mc
-            max_scale = i[0]
+            max_scale = current_scale
             max_response_map = mrm
+    if max_response_map is None:
+        max_response_map = np.zeros(image.shape)
+    stats.done()
     return max_score, maxr, maxc, max_scale, max_response_map
 
 def intersection(r1, r2, c1, c2, shape):
     h, w = shape
     return abs(r1 - r2) <= h and abs(c1 - c2) <= w
 
-def pyramid_find_objects(image, threshold_score, base_score, shape, stepSize=20, scale=0.9):
-    max_score = []
-    maxr = []
-    maxc = []
-    max_scale = []
-    images = pyramid(image, scale)
-    for i in images:
-        ms, mr, mc = find_objects(i[1], threshold_score, base_score, stepSize, shape)
-        for j in range(len(mr)):
-            done = False
-            for k in range(len(maxr)):
-                if intersection(maxr[k] / max_scale[k], mr[j] / i[0], maxc[k] / max_scale[k], mc[j] / i[0], shape):
-                    if max_score[k] < ms[j]:
-                        max_score[k] = ms[j]
-                        maxr[k] = mr[j]
-                        maxc[k] = mc[j]
-                        max_scale[k] = i[0]
-                    done = True
-                    break
-            if done == False:
-                max_score.append(ms[j])
-                maxr.append(mr[j])
-                maxc.append(mc[j])
-                max_scale.append(i[0])
+def merge_objects(objects, ms, mr, mc, current_scale, shape):
+    max_score, maxr, maxc, max_scale = objects
+    for j in range(len(mr)):
+        done = False
+        for k in range(len(maxr)):
+            if intersection(maxr[k] / max_scale[k], mr[j] / current_scale, maxc[k] / max_scale[k], mc[j] / current_scale, shape):
+                if max_score[k] < ms[j]:
+                    max_score[k] = ms[j]
+                    maxr[k] = mr[j]
+                    maxc[k] = mc[j]
+                    max_scale[k] = current_scale
+                done = True
+                break
+        if done == False:
+            max_score.append(ms[j])
+            maxr.append(mr[j])
+            maxc.append(mc[j])
+            max_scale.append(current_scale)
+
+def object_boxes(maxr, maxc, max_scale, shape):
+    # (top, left, bottom, right) of each detection in original image coordinates
+    h, w = shape
+    scales = np.asarray(max_scale, dtype=float)
+    top = np.asarray(maxr, dtype=float) / scales
+    left = np.asarray(maxc, dtype=float) / scales
+    return np.stack([top, left, top + h / scales, left + w / scales], axis=-1).reshape(-1, 4)
+
+def box_overlaps(box, boxes, method):
+    height = np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0])
+    width = np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1])
+    inter = np.maximum(height, 0) * np.maximum(width, 0)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if method == "iou":
+        return inter / (area + areas - inter)
+    if method == "min":
+        return inter / np.minimum(area, areas)
+    raise ValueError("method must be 'iou' or 'min', not %r" % (method,))
+
+def non_max_suppression(boxes, scores, threshold=0.5, method="iou", grid=None):
+    """Indices of the boxes kept by greedy non-maximum suppression, best score first.
+
+    Boxes are rows of (top, left, bottom, right). A box is dropped when its overlap with
+    a better scoring kept box exceeds threshold, measured as intersection over union
+    ("iou") or over the smaller box ("min"). Ties are broken by input order, so the
+    result does not depend on the order detections were found in. With grid (on by
+    default above 1000 boxes) each box is only compared against boxes bucketed in
+    neighbouring cells of a grid as coarse as the largest box.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(-scores, kind="stable")
+    if not len(boxes):
+        return np.array([], dtype=int)
+    if grid is None:
+        grid = len(boxes) > 1000
+    if not grid:
+        keep = []
+        while len(order):
+            i = order[0]
+            keep.append(i)
+            order = order[1:][box_overlaps(boxes[i], boxes[order[1:]], method) <= threshold]
+        return np.array(keep, dtype=int)
+
+    rank = np.empty(len(boxes), dtype=int)
+    rank[order] = np.arange(len(boxes))
+    cell = max(np.max(boxes[:, 2] - boxes[:, 0]), np.max(boxes[:, 3] - boxes[:, 1]), 1.0)
+    cellRows = np.floor((boxes[:, 0] + boxes[:, 2]) / 2 / cell).astype(int)
+    cellCols = np.floor((boxes[:, 1] + boxes[:, 3]) / 2 / cell).astype(int)
+    buckets = {}
+    for k in range(len(boxes)):
+        buckets.setdefault((cellRows[k], cellCols[k]), []).append(k)
+    buckets = dict((key, np.array(value)) for key, value in buckets.items())
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        neighbours = [buckets[key] for key in
+                      ((cellRows[i] + dr, cellCols[i] + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1))
+                      if key in buckets]
+        candidates = np.concatenate(neighbours)
+        candidates = candidates[rank[candidates] > rank[i]]
+        suppressed[candidates[box_overlaps(boxes[i], boxes[candidates], method) > threshold]] = True
+    return np.array(keep, dtype=int)
+
+def suppress_objects(objects, shape, threshold=0.0, method="min"):
+    max_score, maxr, maxc, max_scale = objects
+    keep = non_max_suppression(object_boxes(maxr, maxc, max_scale, shape), max_score, threshold, method)
+    return tuple([values[k] for k in keep] for values in objects)
+
+def oriented_detections(found, templates, threshold=0.0, method="min"):
+    """Detections of found ({name: (max_score, maxr, maxc, max_scale)}) as a list of
+    (component, orientation, score, box, scale) tuples, best first.
+
+    A detection is dropped when a better one of the same component in another
+    orientation overlaps it by more than threshold (see non_max_suppression), since
+    symmetric parts match several orientations in the same place.
+    """
+    detections = []
+    for template in templates:
+        max_score, maxr, maxc, max_scale = found[template.name]
+        boxes = object_boxes(maxr, maxc, max_scale, template.shape)
+        for k in range(len(max_score)):
+            detections.append((component_name(template), template.orientation, float(max_score[k]),
+                               tuple(float(v) for v in boxes[k]), float(max_scale[k])))
+    detections.sort(key=lambda detection: -detection[2])
+    kept = []
+    for detection in detections:
+        rivals = [other[3] for other in kept if other[0] == detection[0] and other[1] != detection[1]]
+        if rivals and np.max(box_overlaps(np.array(detection[3]), np.array(rivals), method)) > threshold:
+            continue
+        kept.append(detection)
+    return kept
+
+def collect_objects(objects, ms, mr, mc, current_scale):
+    max_score, maxr, maxc, max_scale = objects
+    max_score.extend(ms)
+    maxr.extend(mr)
+    maxc.extend(mc)
+    max_scale.extend([current_scale] * len(ms))
+
+def add_objects(objects, ms, mr, mc, current_scale, shape, nms=None):
+    # one level's hits: merged first come by intersection when nms is None, else
+    # collected for finish_objects to suppress
+    if nms is None:
+        merge_objects(objects, ms, mr, mc, current_scale, shape)
+    else:
+        collect_objects(objects, ms, mr, mc, current_scale)
+
+def finish_objects(objects, shape, nms=None, nms_method="min"):
+    # objects once every level is added with add_objects
+    if nms is None:
+        return objects
+    return suppress_objects(objects, shape, nms, nms_method)
+
+def pyramid_find_objects(image, threshold_score, base_score, shape, stepSize=20, scale=0.9, dense=False,
+                         executor=None, workers=None, nms=None, nms_method="min", dtype=None, stats=NO_STATS,
+                         prefilter=None):
+    # nms=None keeps the original first-come intersection merge; a number instead collects
+    # every level's hits and runs non_max_suppression with that overlap threshold.
+    objects = ([], [], [], [])
+    images = iter_pyramid(image, scale, dtype=dtype, stats=stats)
+    scan = partial(find_objects, threshold_score=threshold_score, base_score=base_score,
+                   stepSize=stepSize, windowSize=shape, dense=dense, prefilter=prefilter)
+    for current_scale, (ms, mr, mc) in map_levels(scan, images, executor, workers, stats):
+        stats.start("merge")
+        add_objects(objects, ms, mr, mc, current_scale, shape, nms)
+        stats.stop()
+    stats.start("merge")
+    objects = finish_objects(objects, shape, nms, nms_method)
+    stats.stop()
+    stats.done()
+    max_score, maxr, maxc, max_scale = objects
     return max_score, maxr, maxc, max_scale
 
-def plot_prediction_pyramid(image, max_scale, winW, winH, maxc, maxr):
-    fig, ax = plt.subplots(1)
-    ax.imshow(rescale(image, max_scale))
-    rect = patches.Rectangle((maxc, maxr), winW, winH, linewidth=1, edgecolor='r', facecolor='none')
-    ax.add_patch(rect)
-    plt.show()
+def _refine_windows(seeds, ratio, radius, rows, cols):
+    # grid indices within radius steps of each seed window, mapped to a level `ratio` times larger
+    I, J = seeds
+    offsets = np.arange(-radius, radius + 1)
+    I = (np.round(I * ratio).astype(int)[:, None, None] + offsets[None, :, None]).ravel()
+    J = (np.round(J * ratio).astype(int)[:, None, None] + offsets[None, None, :]).ravel()
+    inside = (I >= 0) & (I < rows) & (J >= 0) & (J < cols)
+    flat = np.unique(I[inside] * cols + J[inside])
+    return flat // cols, flat % cols
+
+def coarse_to_fine_find_objects(image, threshold_score, base_score, shape, stepSize=20, scale=0.9,
+                                candidate_threshold=None, coarse_levels=1, radius=1, dense=False,
+                                nms=None, nms_method="min", stats=NO_STATS, prefilter=None):
+    """pyramid_find_objects that only scans the coarse_levels smallest levels exhaustively.
+
+    Every finer level is scored only within radius window steps of the windows that beat
+    candidate_threshold (half of threshold_score by default) on the level below it.
+    The hits are merged finest level first once all levels are scanned, as in
+    pyramid_find_objects, so scanning every level finds the same objects.
+    Returns max_score, maxr, maxc, max_scale like pyramid_find_objects, plus a dict with
+    the number of windows evaluated and the number an exhaustive scan would evaluate.
+    """
+    if candidate_threshold is None:
+        candidate_threshold = threshold_score / 2.0
+    winH, winW = shape
+    objects = ([], [], [], [])
+    hits = []
+    counts = {"windows": 0, "exhaustive": 0}
+    seeds = None
+    previous_scale = None
+    for n, (current_scale, level) in enumerate(reversed(list(iter_pyramid(image, scale, stats=stats)))):
+        H, W = level.shape
+        rows, cols = (H - 1) // stepSize + 1, (W - 1) // stepSize + 1
+        counts["exhaustive"] += rows * cols
+        if n < coarse_levels:
+            windows = None
+        else:
+            windows = _refine_windows(seeds, current_scale / previous_scale, radius, rows, cols)
+        previous_scale = current_scale
+        if windows is not None and len(windows[0]) == 0:
+            seeds = windows
+            continue
+
+        start = time.perf_counter()
+        rejected = stats.rejected
+        I, J, scores = score_windows(level, base_score, stepSize, shape, windows, dense, stats, prefilter)
+        if stats is not NO_STATS:
+            stats.levels.append({"scale": current_scale, "shape": [H, W], "windows": len(scores),
+                                 "rejected": stats.rejected - rejected,
+                                 "seconds": time.perf_counter() - start})
+        counts["windows"] += len(scores)
+        hit = scores > threshold_score
+        ms = list(scores[hit])
+        mr = (I[hit] * stepSize - winH // 2).tolist()
+        mc = (J[hit] * stepSize - winW // 2).tolist()
+        hits.append((current_scale, ms, mr, mc))
+        loose = scores > candidate_threshold
+        seeds = (I[loose], J[loose])
+
+    stats.start("merge")
+    for current_scale, ms, mr, mc in reversed(hits):
+        add_objects(objects, ms, mr, mc, current_scale, shape, nms)
+    objects = finish_objects(objects, shape, nms, nms_method)
+    stats.stop()
+    stats.done()
+    max_score, maxr, maxc, max_scale = objects
+    return max_score, maxr, maxc, max_scale, counts
+
+def pyramid_find_objects_multi(image, templates, stepSize=20, scale=0.9, executor=None, workers=None,
+                               nms=None, nms_method="min", dtype=None, stats=NO_STATS, prefilter=None):
+    # Same as calling pyramid_find_objects once per template, from a single pyramid
+    # traversal; returns {name: (max_score, maxr, maxc, max_scale)}.
+    objects = dict((template.name, ([], [], [], [])) for template in templates)
+    images = iter_pyramid(image, scale, dtype=dtype, stats=stats)
+    scan = partial(find_objects_multi, templates=templates, stepSize=stepSize, prefilter=prefilter)
+    for current_scale, found in map_levels(scan, images, executor, workers, stats):
+        stats.start("merge")
+        for template in templates:
+            ms, mr, mc = found[template.name]
+            add_objects(objects[template.name], ms, mr, mc, current_scale, template.shape, nms)
+        stats.stop()
+    stats.start("merge")
+    for template in templates:
+        objects[template.name] = finish_objects(objects[template.name], template.shape, nms, nms_method)
+    stats.stop()
+    stats.done()
+    return objects
+
+def changed_tiles(old, new, tile=64):
+    # (top, bottom, left, right) boxes covering the tile x tile tiles in which new differs
+    # from old, one box per run of changed tiles along a row of tiles
+    changed = np.asarray(old) != np.asarray(new)
+    H, W = changed.shape
+    nR, nC = -(-H // tile), -(-W // tile)
+    grid = np.zeros((nR * tile, nC * tile), dtype=bool)
+    grid[:H, :W] = changed
+    dirty = grid.reshape(nR, tile, nC, tile).any(axis=(1, 3))
+    boxes = []
+    for r in range(nR):
+        cols = np.nonzero(dirty[r])[0]
+        for run in np.split(cols, np.nonzero(np.diff(cols) > 1)[0] + 1):
+            if len(run):
+                boxes.append((r * tile, min((r + 1) * tile, H), int(run[0]) * tile, min((int(run[-1]) + 1) * tile, W)))
+    return _merge_boxes(boxes)
+
+def _merge_boxes(boxes):
+    # joins boxes whose bounding box is no bigger than the two of them, so a long
+    # diagonal edit stays a chain of small boxes instead of one huge one
+    area = lambda box: (box[1] - box[0]) * (box[3] - box[2])
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(boxes)):
+            for b in range(a + 1, len(boxes)):
+                (t1, b1, l1, r1), (t2, b2, l2, r2) = boxes[a], boxes[b]
+                union = (min(t1, t2), max(b1, b2), min(l1, l2), max(r1, r2))
+                if area(union) <= area(boxes[a]) + area(boxes[b]):
+                    boxes[a] = union
+                    del boxes[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+def _value_range(image):
+    # the range rescale clips its output to
+    return tuple(util.img_as_float(np.array([image.min(), image.max()], dtype=image.dtype)))
+
+def rescale_box(source, target, box, limits=None):
+    """Redo target = rescale(source, ...) where source changed inside box, in place.
+
+    Follows skimage's rescale for downscaling (Gaussian anti-aliasing, then linear
+    interpolation at the output pixel centres, clipped to the source's value range
+    `limits`) on a crop around the box. Returns the box of target pixels that were
+    recomputed.
+    """
+    H, W = source.shape
+    h, w = target.shape
+    factors = (H / float(h), W / float(w))
+    sigmas = [max(0, (f - 1) / 2.0) for f in factors]
+    # pixels the Gaussian and the interpolation reach, as ndimage truncates the kernel
+    reach = [int(4.0 * sigma + 0.5) + 1 for sigma in sigmas]
+    spans = []
+    for (a, b), f, n, size, R in zip((box[:2], box[2:]), factors, (h, w), (H, W), reach):
+        o0 = max(int(np.floor((a - R + 0.5) / f - 0.5)), 0)
+        o1 = min(int(np.ceil((b + R + 0.5) / f - 0.5)) + 1, n)
+        x = (np.arange(o0, o1) + 0.5) * f - 0.5
+        s0 = max(int(np.floor(x[0])) - R - 1, 0)
+        s1 = min(int(np.ceil(x[-1])) + R + 2, size)
+        spans.append((o0, o1, x - s0, s0, s1))
+    (o0, o1, x, a0, a1), (p0, p1, y, b0, b1) = spans
+    crop = scipy.ndimage.gaussian_filter(util.img_as_float(source[a0:a1, b0:b1]), sigmas, mode='mirror')
+    values = scipy.ndimage.map_coordinates(crop, np.meshgrid(x, y, indexing='ij'), order=1, mode='mirror')
+    if limits is None:
+        limits = _value_range(source)
+    target[o0:o1, p0:p1] = np.clip(values, *limits)
+    return (o0, o1, p0, p1)
+
+class DetectionSession(object):
+    """pyramid_find_objects_multi over successive snapshots of one canvas.
+
+    Every pyramid level keeps its image, HogGrid and response maps. update() diffs the
+    new snapshot against the last one in tile x tile tiles, carries the changed boxes
+    down the pyramid, recomputes gradients and cell histograms only there and rescores
+    only the windows that overlap them, so the cost follows the size of the edit.
+    Detections match a fresh pyramid_find_objects_multi on the same snapshot; a
+    snapshot of another shape or dtype starts over. rescale clips every level to the
+    value range of the one above, so an edit that moves that range (the first stroke
+    on a blank canvas) rescales the next level whole and diffs it instead.
+    """
+
+    def __init__(self, templates, stepSize=20, scale=0.9, nms=None, nms_method="min", tile=64, stats=NO_STATS):
+        self.templates = templates
+        self.stepSize = stepSize
+        self.scale = scale
+        self.nms = nms
+        self.nms_method = nms_method
+        self.tile = tile
+        self.stats = stats
+        self.groups = group_templates(templates)
+        self.weights = dict((shape, np.array([template.base_score for template in group]))
+                            for shape, group in self.groups.items())
+        self.levels = []
+
+    def update(self, image):
+        # returns {name: (max_score, maxr, maxc, max_scale)} for the new snapshot
+        image = np.asarray(image)
+        if self.levels and image.shape == self.levels[0]["image"].shape and image.dtype == self.levels[0]["image"].dtype:
+            boxes = changed_tiles(self.levels[0]["image"], image, self.tile)
+            if boxes:
+                self._update(image, boxes)
+        else:
+            self._rebuild(image)
+        return self.detections()
+
+    def _rebuild(self, image):
+        self.levels = []
+        limits = None
+        for current_scale, level in iter_pyramid(np.array(image), self.scale, stats=self.stats):
+            grid = HogGrid(level, list(self.groups), self.stats, keepHistograms=True)
+            maps = dict((shape, grid.scores(self.weights[shape], shape, self.stepSize)) for shape in self.groups)
+            self.levels.append({"scale": current_scale, "image": level, "grid": grid, "maps": maps,
+                                "limits": limits})
+            self._threshold(self.levels[-1])
+            limits = _value_range(level)
+
+    def _update(self, image, boxes):
+        for n, level in enumerate(self.levels):
+            if n == 0:
+                for r0, r1, c0, c1 in boxes:
+                    level["image"][r0:r1, c0:c1] = image[r0:r1, c0:c1]
+            else:
+                self.stats.start("pyramid")
+                source = self.levels[n - 1]["image"]
+                limits = _value_range(source)
+                if limits == level["limits"]:
+                    boxes = _merge_boxes([rescale_box(source, level["image"], box, limits) for box in boxes])
+                else:
+                    target = transform.rescale(source, self.scale)
+                    boxes = changed_tiles(level["image"], target, self.tile)
+                    level["image"][...] = target
+                    level["limits"] = limits
+                self.stats.stop()
+                if not boxes:
+                    break
+            grid = level["grid"]
+            changed = [grid.update(level["image"], box) for box in boxes]
+            for shape, response_map in level["maps"].items():
+                rescore = np.zeros(response_map.shape[:2], dtype=bool)
+                for box in changed:
+                    i0, i1, j0, j1 = grid.windows_touching(shape, self.stepSize, box)
+                    rescore[i0:i1, j0:j1] = True
+                I, J = np.nonzero(rescore)
+                response_map[I, J] = grid.window_scores(self.weights[shape], shape, self.stepSize, I, J)
+            self._threshold(level)
+
+    def _threshold(self, level):
+        found = {}
+        for shape, group in self.groups.items():
+            for k, template in enumerate(group):
+                found[template.name] = threshold_response_map(
+                    level["maps"][shape][..., k], level["image"].shape, template.threshold, self.stepSize, shape)
+        level["found"] = found
+
+    def detections(self):
+        objects = dict((template.name, ([], [], [], [])) for template in self.templates)
+        self.stats.start("merge")
+        for level in self.levels:
+            for template in self.templates:
+                ms, mr, mc = level["found"][template.name]
+                add_objects(objects[template.name], ms, mr, mc, level["scale"], template.shape, self.nms)
+        for template in self.templates:
+            objects[template.name] = finish_objects(objects[template.name], template.shape,
+                                                    self.nms, self.nms_method)
+        self.stats.stop()
+        return objects
+
+# Tiled detection for scans too big for memory. Every pyramid level lives in a .npy
+# file that is memory mapped, each level is built from the one above a tile at a
+# time with rescale_box, and the windows of a level are split between tiles whose
+# HogGrids read only their tile plus a window's worth of surrounding pixels. Each
+# window belongs to exactly one tile, so the stitched detections have no duplicates
+# and equal pyramid_find_objects_multi on the whole image.
+def open_scan(source, directory):
+    """The scan at source as a 2-D memory-mapped .npy file in directory; returns its path.
+
+    A 2-D .npy file is used in place, TIFFs are memory mapped with tifffile where
+    their layout allows it, other files are read whole, and colour is converted to
+    gray a band of rows at a time.
+    """
+    if isinstance(source, str):
+        if source.lower().endswith(".npy"):
+            image = np.load(source, mmap_mode='r')
+            if image.ndim == 2:
+                return source
+        else:
+            image = None
+            if source.lower().endswith((".tif", ".tiff")):
+                try:
+                    import tifffile
+                    image = tifffile.memmap(source, mode='r')
+                except (ImportError, ValueError):
+                    image = None
+            if image is None:
+                image = skimage.io.imread(source, as_gray=True)
+    else:
+        image = source
+    path = os.path.join(directory, "level-0.npy")
+    if image.ndim == 2:
+        target = np.lib.format.open_memmap(path, mode='w+', dtype=image.dtype, shape=image.shape)
+    else:
+        target = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=image.shape[:2])
+    for start in range(0, image.shape[0], 256):
+        band = np.asarray(image[start:start + 256])
+        if band.ndim == 3:
+            band = color.rgb2gray(band[..., :3])
+        target[start:start + 256] = band
+    target.flush()
+    del target
+    return path
+
+def _band_range(image, rows=256):
+    low, high = None, None
+    for start in range(0, image.shape[0], rows):
+        band = image[start:start + rows]
+        low = band.min() if low is None else min(low, band.min())
+        high = band.max() if high is None else max(high, band.max())
+    return tuple(util.img_as_float(np.array([low, high], dtype=image.dtype)))
+
+def iter_tiled_pyramid(path, directory, scale=0.9, minSize=(200, 100), tile=1024, stats=NO_STATS):
+    # Like iter_pyramid, but yields (scale, path) with every level written to a .npy
+    # file in directory and resampled a tile x tile box at a time.
+    current_scale = 1.0
+    yield (current_scale, path)
+    level = np.load(path, mmap_mode='r')
+    n = 0
+    while True:
+        H, W = level.shape
+        if H * scale < minSize[0] or W * scale < minSize[1]:
+            break
+        n += 1
+        current_scale *= scale
+        stats.start("pyramid")
+        shape = tuple(int(v) for v in np.maximum(np.round(scale * np.array(level.shape)), 1))
+        path = os.path.join(directory, "level-%d.npy" % n)
+        target = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+        limits = _band_range(level)
+        for r in range(0, H, tile):
+            for c in range(0, W, tile):
+                rescale_box(level, target, (r, min(r + tile, H), c, min(c + tile, W)), limits)
+        target.flush()
+        del target
+        stats.stop()
+        yield (current_scale, path)
+        level = np.load(path, mmap_mode='r')
+
+def _scan_tile(task, templates, stepSize, prefilter=None, stats=False):
+    # (detections of templates among the windows owned by one tile, in level coordinates,
+    # and the tile's DetectionStats if stats, else None)
+    path, box = task
+    tile_stats = DetectionStats() if stats else NO_STATS
+    level = np.load(path, mmap_mode='r')
+    grid = HogGrid(level, [template.shape for template in templates], tile_stats, box=box)
+    found = {}
+    for shape, group in group_templates(templates).items():
+        keep = None
+        if prefilter is not None:
+            keep = content_mask(level, shape, stepSize, prefilter, tile_stats, box)
+            tile_stats.count_rejected(int(keep.size - np.count_nonzero(keep)) * len(group))
+        response_maps = grid.scores(np.array([template.base_score for template in group]), shape, stepSize, keep)
+        for k, template in enumerate(group):
+            ms, mr, mc = threshold_response_map(response_maps[..., k], grid.shape, template.threshold, stepSize, shape)
+            found[template.name] = (ms, [r + box[0] for r in mr], [c + box[2] for c in mc])
+    return found, tile_stats if stats else None
+
+def tiled_find_objects_multi(source, templates, stepSize=20, scale=0.9, tile=1024, executor=None, workers=None,
+                             nms=None, nms_method="min", directory=None, stats=NO_STATS, prefilter=None):
+    """pyramid_find_objects_multi on a scan read a tile at a time.
+
+    source is an image array or file path (see open_scan). Tiles are tile x tile
+    pixels, rounded down to a multiple of stepSize, and are scanned on executor (as in
+    map_levels, with one pool for every level), so peak memory follows the tile size and
+    the worker count rather than the scan. Levels are kept in directory, a temporary
+    directory by default.
+    """
+    tile = max(tile // stepSize, 1) * stepSize
+    workdir = tempfile.mkdtemp(dir=directory)
+    pool = None
+    if executor is not None and not isinstance(executor, Executor):
+        pool = executor = make_executor(executor, workers)
+    try:
+        objects = dict((template.name, ([], [], [], [])) for template in templates)
+        scan = partial(_scan_tile, templates=templates, stepSize=stepSize, prefilter=prefilter,
+                       stats=stats is not NO_STATS)
+        levels = iter_tiled_pyramid(open_scan(source, workdir), workdir, scale, tile=tile, stats=stats)
+        for current_scale, path in levels:
+            H, W = np.load(path, mmap_mode='r').shape
+            tasks = [(current_scale, (path, (r, min(r + tile, H), c, min(c + tile, W))))
+                     for r in range(0, H, tile) for c in range(0, W, tile)]
+            hits = dict((template.name, []) for template in templates)
+            start = time.perf_counter()
+            windows, rejected = stats.windows, stats.rejected
+            for current_scale, (found, tile_stats) in map_levels(scan, tasks, executor):
+                if tile_stats is not None:
+                    stats.merge(tile_stats)
+                for template in templates:
+                    hits[template.name].extend(zip(found[template.name][1], found[template.name][2],
+                                                   found[template.name][0]))
+            if stats is not NO_STATS:
+                stats.levels.append({"scale": current_scale, "shape": [H, W], "windows": stats.windows - windows,
+                                     "rejected": stats.rejected - rejected,
+                                     "seconds": time.perf_counter() - start})
+            stats.start("merge")
+            for template in templates:
+                # the row-major order a whole-level scan finds them in, for add_objects
+                level_hits = sorted(hits[template.name], key=lambda hit: hit[:2])
+                ms = [hit[2] for hit in level_hits]
+                mr = [hit[0] for hit in level_hits]
+                mc = [hit[1] for hit in level_hits]
+                add_objects(objects[template.name], ms, mr, mc, current_scale, template.shape, nms)
+            stats.stop()
+        stats.start("merge")
+        for template in templates:
+            objects[template.name] = finish_objects(objects[template.name], template.shape, nms, nms_method)
+        stats.stop()
+        stats.done()
+        return objects
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+PLOTS = ("plot_hog", "plot_prediction", "plot_heatmap", "plot_prediction_pyramid")
+
+def __getattr__(name):
+    # cs347.plot_hog and friends still work, importing plot_cs347 (and matplotlib) on first use
+    if name in PLOTS:
+        import plot_cs347
+        return getattr(plot_cs347, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Headless batch detection: runs pyramid_find_objects_multi over a directory or glob of
+# circuit drawings on a process pool and writes one JSON line per image as soon as it
+# finishes. Images already recorded in the output file are skipped, so an interrupted
+# run can be resumed with the same command.
+#
+#   python3 detect_cs347.py submissions/ -o detections.jsonl --workers 8
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import skimage
+
+import cs347
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".npy")
+
+# per worker process, set by init_worker
+templates = None
+options = None
+
+def find_images(inputs):
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        paths.extend(path for path in matches
+                     if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(set(paths))
+
+def finished_images(output):
+    # images with a detections record in output; errored or truncated lines are retried
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "detections" in record:
+                done.add(record["image"])
+    return done
+
+def init_worker(args):
+    global templates, options
+    options = args
+    templates = cs347.load_templates(args.templates, cache=args.cache, orientations=args.orientations)
+
+def detect(image, templates, stepSize, scale, nms, dtype=None, prefilter=None, tile=None):
+    # with tile, image may also be a path, read a tile at a time
+    if tile:
+        found = cs347.tiled_find_objects_multi(image, templates, stepSize, scale, tile=tile, nms=nms,
+                                               prefilter=prefilter)
+    else:
+        found = cs347.pyramid_find_objects_multi(image, templates, stepSize, scale, nms=nms, dtype=dtype,
+                                                 prefilter=prefilter)
+    detections = []
+    for component, orientation, score, box, scale in cs347.oriented_detections(found, templates):
+        detections.append({
+            "class": component,
+            "orientation": orientation,
+            "score": score,
+            "box": [round(v, 2) for v in box],
+            "scale": scale,
+        })
+    return detections
+
+def detect_file(path):
+    try:
+        if options.tile:
+            image = path
+        elif path.lower().endswith(".npy"):
+            image = np.load(path)
+        else:
+            image = skimage.io.imread(path, as_gray=True)
+        dtype = np.float32 if options.float32 else None
+        detections = detect(image, templates, options.step, options.scale, options.nms, dtype, prefilter(options),
+                            options.tile)
+        return {"image": path, "detections": detections}
+    except Exception as e:
+        return {"image": path, "error": "%s: %s" % (type(e).__name__, e)}
+
+def prefilter(args):
+    if args.min_ink is None and args.min_gradient is None:
+        return None
+    return cs347.Prefilter(args.min_ink or 0.0, args.min_gradient or 0.0)
+
+def parse_orientations(text):
+    if text == "all":
+        return cs347.ORIENTATIONS
+    orientations = tuple(text.split(","))
+    for orientation in orientations:
+        if orientation not in cs347.ORIENTATIONS:
+            raise argparse.ArgumentTypeError("unknown orientation %r" % orientation)
+    return orientations
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Detect circuit components in a batch of drawings.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="JSON lines file to append to (default: stdout, no resume)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--templates", default="components", help="directory of component templates")
+    parser.add_argument("--cache", default=None, help="directory to cache template descriptors in")
+    parser.add_argument("--step", type=int, default=16, help="sliding window stride in pixels")
+    parser.add_argument("--scale", type=float, default=0.8, help="pyramid downscale factor per level")
+    parser.add_argument("--nms", type=float, default=0.0,
+                        help="overlap above which weaker detections are suppressed")
+    parser.add_argument("--float32", action="store_true", help="scan pyramid levels as float32")
+    parser.add_argument("--orientations", type=parse_orientations, default=("0",),
+                        help="comma separated template orientations to look for (%s), or 'all'"
+                             % ",".join(cs347.ORIENTATIONS))
+    parser.add_argument("--min-ink", type=float, default=None,
+                        help="skip windows whose mean darkness (0-1) is below this")
+    parser.add_argument("--min-gradient", type=float, default=None,
+                        help="skip windows whose mean gradient magnitude is not above this")
+    parser.add_argument("--tile", type=int, default=None,
+                        help="scan large images in tiles of this many pixels, memory mapped from disk")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    paths = find_images(args.inputs)
+    if args.output is not None:
+        done = finished_images(args.output)
+        paths = [path for path in paths if path not in done]
+        out = open(args.output, "a")
+        if out.tell() > 0:
+            # a previous run may have died mid-line
+            with open(args.output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+    else:
+        out = sys.stdout
+
+    pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args,))
+    try:
+        for record in pool.imap_unordered(detect_file, paths):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        pool.close()
+        pool.join()
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Plotting helpers for the notebook, kept out of cs347 so the detection engine imports
+# without matplotlib. cs347.plot_* still resolve to these on first use.
+
+import matplotlib.patches as patches
+import matplotlib.pyplot as plt
+from skimage.transform import rescale
+
+def plot_hog(image, hog):
+    plt.subplot(1, 2, 1)
+    plt.imshow(image)
+    plt.axis('off')
+
+    plt.subplot(1, 2, 2)
+    plt.imshow(hog)
+    plt.axis('off')
+
+    plt.show()
+
+def plot_prediction(image, r, c, winW, winH):
+    fig, ax = plt.subplots(1)
+    ax.imshow(image)
+    rect = patches.Rectangle((c, r), winW, winH, linewidth=1, edgecolor='r', facecolor='none')
+    ax.add_patch(rect)
+    plt.show()
+
+def plot_heatmap(response_map):
+    plt.imshow(response_map, cmap='viridis', interpolation='nearest')
+    plt.title('sliding window')
+    plt.show()
+
+def plot_prediction_pyramid(image, max_scale, winW, winH, maxc, maxr):
+    fig, ax = plt.subplots(1)
+    ax.imshow(rescale(image, max_scale))
+    rect = patches.Rectangle((maxc, maxr), winW, winH, linewidth=1, edgecolor='r', facecolor='none')
+    ax.add_patch(rect)
+    plt.show()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# Local drawing-to-Fritzing service: POST the PNG saved from the index.html canvas to
+# /convert and get the .fz sketch back. The templates are loaded once per worker
+# process, and each detected part is snapped onto the breadboard holes it is drawn
+# over. At most --workers drawings are converted at once and --queue more wait;
+# beyond that the service answers 503 so callers can back off.
+#
+#   python3 serve_cs347.py --port 8347 --workers 4
+#   curl --data-binary @mypainting.png localhost:8347/convert -o mypainting.fz
+
+import argparse
+import concurrent.futures
+import io
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import skimage
+
+import detect_cs347
+import ExportToFritzing_CS347 as fritzing
+
+# breadboard.png, which the canvas is stretched over: its shape and hole centres in pixels
+BOARD_IMAGE_SHAPE = (1247, 3856)
+COLUMN_X = (91.78, 59.25)  # x of column 1, then the pitch between columns
+ROW_Y = {
+    "Z": 61.3, "Y": 119.3,
+    "J": 297.5, "I": 355.5, "H": 417.5, "G": 475.5, "F": 534.5,
+    "E": 711.5, "D": 769.5, "C": 831.5, "B": 889.5, "A": 948.5,
+    "X": 1127.3, "W": 1185.3,
+}
+
+# detected class -> netlist component type, and whether its leads are at the top and
+# bottom of the template (rather than its left and right)
+PARTS = {
+    "resistor": ("resistor", True),
+    "voltagesource": ("power", True),
+    "wire": ("wire", False),
+}
+
+def hole_centres(board=fritzing.BREADBOARD):
+    # (n, 2) y, x of every pin of board in breadboard.png
+    ys = np.array([ROW_Y[row] for row in board.rows])
+    xs = COLUMN_X[0] + COLUMN_X[1] * (board.numbers - 1)
+    return np.stack([ys, xs], axis=1)
+
+def nearest_pins(points, shape, board=fritzing.BREADBOARD):
+    # pin names nearest each (y, x) of points, given in pixels of a drawing of this shape
+    scale = np.array(BOARD_IMAGE_SHAPE, dtype=float) / shape[:2]
+    points = np.asarray(points, dtype=float).reshape(-1, 2) * scale
+    centres = hole_centres(board)
+    distances = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+    return [board.names[i] for i in np.argmin(distances, axis=1)]
+
+def leads(box, orientation, vertical):
+    # (y, x) of the two ends of a part in box, top or left first
+    top, left, bottom, right = box
+    if orientation.rstrip("m") in ("90", "270"):
+        vertical = not vertical
+    if vertical:
+        middle = (left + right) / 2.0
+        return [(top, middle), (bottom, middle)]
+    middle = (top + bottom) / 2.0
+    return [(middle, left), (middle, right)]
+
+def detections_to_netlist(detections, shape):
+    """A netlist for detections (as detect_cs347.detect returns them) in a drawing of shape."""
+    parts = [d for d in detections if d["class"] in PARTS]
+    points = [point for d in parts for point in leads(d["box"], d["orientation"], PARTS[d["class"]][1])]
+    pins = nearest_pins(points, shape) if points else []
+    components = []
+    counts = {}
+    for i, d in enumerate(parts):
+        kind = PARTS[d["class"]][0]
+        counts[kind] = counts.get(kind, 0) + 1
+        component = {"type": kind, "title": "%s_%d" % (kind, counts[kind]), "pins": pins[2 * i:2 * i + 2]}
+        if kind == "resistor":
+            component["resistance"] = 200
+        components.append(component)
+    return {"components": components, "connections": []}
+
+def read_drawing(data):
+    # the canvas PNG is black strokes on a transparent background
+    image = skimage.io.imread(io.BytesIO(data))
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = skimage.color.rgba2rgb(image, background=(1, 1, 1))
+    if image.ndim == 3:
+        image = skimage.color.rgb2gray(image)
+    return skimage.util.img_as_float(image)
+
+def convert_drawing(data):
+    # PNG bytes -> (.fz bytes, number of parts, NetReport), in a worker process set up by
+    # detect_cs347.init_worker
+    options = detect_cs347.options
+    image = read_drawing(data)
+    detections = detect_cs347.detect(image, detect_cs347.templates, options.step, options.scale, options.nms)
+    netlist, report = fritzing.pruneNetlist(detections_to_netlist(detections, image.shape))
+    return fritzing.convert(netlist, prune=False), len(netlist["components"]), report
+
+class Handler(BaseHTTPRequestHandler):
+    # the server has executor, a ProcessPoolExecutor, slots, bounding the requests in it,
+    # and max_bytes, the largest drawing it accepts
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        self.reply(200, b"ok\n", "text/plain")
+
+    def do_POST(self):
+        if self.path != "/convert":
+            self.send_error(404)
+            return
+        # a request turned away leaves its body unread, so its connection cannot be reused
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self.close_connection = True
+            self.send_error(400, "expected the PNG as the request body, with its Content-Length")
+            return
+        if length > self.server.max_bytes:
+            self.close_connection = True
+            self.send_error(413, "drawings are limited to %d bytes" % self.server.max_bytes)
+            return
+        if not self.server.slots.acquire(blocking=False):
+            self.close_connection = True
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            data = self.rfile.read(length)
+            sketch, parts, report = self.server.executor.submit(convert_drawing, data).result()
+        except Exception as e:
+            self.send_error(422, "%s: %s" % (type(e).__name__, e))
+            return
+        finally:
+            self.server.slots.release()
+        self.reply(200, sketch, "application/octet-stream", {
+            "X-Parts": str(parts),
+            "X-Net-Report": json.dumps(report._asdict()),
+        })
+
+    def reply(self, status, body, contentType, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+def make_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.executor = concurrent.futures.ProcessPoolExecutor(args.workers, initializer=detect_cs347.init_worker,
+                                                             initargs=(args,))
+    workers = args.workers or os.cpu_count()
+    server.slots = threading.BoundedSemaphore(workers + args.queue)
+    server.max_bytes = args.max_bytes
+    server.quiet = args.quiet
+    # load the templates in every worker before taking requests
+    list(server.executor.map(int, range(workers)))
+    return server
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Serve drawing to Fritzing sketch conversion over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8347)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--queue", type=int, default=16, help="requests that may wait for a worker before 503s")
+    parser.add_argument("--max-bytes", type=int, default=16 * 1024 * 1024,
+                        help="largest drawing accepted, in bytes, before 413s")
+    parser.add_argument("--templates", default="components", help="directory of component templates")
+    parser.add_argument("--cache", default=None, help="directory to cache template descriptors in")
+    parser.add_argument("--step", type=int, default=16, help="sliding window stride in pixels")
+    parser.add_argument("--scale", type=float, default=0.8, help="pyramid downscale factor per level")
+    parser.add_argument("--nms", type=float, default=0.3,
+                        help="overlap above which weaker detections are suppressed")
+    parser.add_argument("--orientations", type=detect_cs347.parse_orientations, default=("0", "90"),
+                        help="comma separated template orientations to look for, or 'all'")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    server = make_server(args)
+    sys.stderr.write("serving on http://%s:%d/convert\n" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown()
+
+if __name__ == "__main__":
+    main()